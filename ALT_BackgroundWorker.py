@@ -0,0 +1,125 @@
+# Runs one shard of a batch job for AssetLibraryTools inside a background blender, started by backgroundWorkers in __init__.py:
+#   blender -b --factory-startup --python-exit-code 1 --python ALT_BackgroundWorker.py -- job.json
+# The job file says what kind of job it is, the addon settings to use, the items of the shard and where to save the result
+# What was made is saved to the output .blend, and a summary of it to output + '.json'
+import bpy
+import importlib
+import json
+import os
+import pathlib
+import sys
+
+
+# Imports and registers the addon from its directory, blender is started with factory settings so it isnt enabled
+def loadAddon(addonDir):
+    sys.path.insert(0, os.path.dirname(addonDir))
+    addon = importlib.import_module(os.path.basename(addonDir))
+    addon.register()
+    return addon
+
+
+# Sets the tool properties to the values the addon had in the blender that started this worker
+def applySettings(tool, settings):
+    for name, value in settings.items():
+        try:
+            setattr(tool, name, value)
+        except (AttributeError, TypeError, ValueError):
+            print("ALT_BackgroundWorker: could not set {0}".format(name))
+
+
+# Builds the materials of a shard of texture sets, items are [name, path, [files], {texture path: proxy path}]
+# The summary maps each texture set path to the name of its material, or None if it contained no textures
+def pbrShard(addon, tool, job):
+    textureSets = importlib.import_module(addon.__name__ + '.textureSets')
+    proxies = {}
+    for name, path, files, setProxies in job['items']:
+        proxies.update(setProxies)
+    images = addon.imageCache(proxies)
+    templates = addon.shaderTemplates()
+    materials = {}
+    built = set()
+    for n, (name, path, files, setProxies) in enumerate(job['items']):
+        ts = textureSets.TextureSet(name, path, [pathlib.Path(f) for f in files], None)
+        mat = addon.OT_BatchImportPBR.buildMaterial(tool, ts, images, templates)
+        materials[path] = mat.name if mat != None else None
+        if mat != None:
+            built.add(mat)
+        print("ALT_BackgroundWorker: {0}/{1} {2}".format(n+1, len(job['items']), name))
+    templates.remove()
+    # Only the materials (and the images they use) are written, with a fake user so they survive being saved without users
+    bpy.data.libraries.write(job['output'], built, fake_user=True, path_remap='ABSOLUTE')
+    return {'materials': materials}
+
+
+# Makes proxy textures, items are [texture path, proxy path, size]
+# Textures are scaled down so their largest side is (size) pixels and saved in the format they were loaded in
+# Each proxy is written under a temporary name and renamed when complete, so the cache never holds half written proxies
+# The summary lists the textures no proxy could be made for
+def proxyShard(addon, tool, job):
+    failed = []
+    for n, (source, proxy, size) in enumerate(job['items']):
+        try:
+            image = bpy.data.images.load(source)
+            width, height = image.size
+            if max(width, height) > size:
+                scale = size / max(width, height)
+                image.scale(max(1, round(width * scale)), max(1, round(height * scale)))
+            os.makedirs(os.path.dirname(proxy), exist_ok=True)
+            image.filepath_raw = proxy + '.part'
+            image.save()
+            os.replace(proxy + '.part', proxy)
+            bpy.data.images.remove(image)
+        except (RuntimeError, OSError) as e:
+            print("ALT_BackgroundWorker: no proxy for {0}: {1}".format(source, e))
+            failed.append(source)
+        print("ALT_BackgroundWorker: {0}/{1} {2}".format(n+1, len(job['items']), source))
+    return {'failed': failed}
+
+
+# Imports a shard of model files, items are [file path, extension]
+# Everything from the startup file is deleted first, so the scene only holds what was imported
+# The top level collections and objects of the scene are written, the summary lists them with the number of imported files and errors
+def modelsShard(addon, tool, job):
+    context = bpy.context
+    for obj in list(bpy.data.objects):
+        bpy.data.objects.remove(obj)
+    for coll in list(bpy.data.collections):
+        bpy.data.collections.remove(coll)
+    context.view_layer.active_layer_collection = context.view_layer.layer_collection
+    imported = 0
+    errors = 0
+    cache = addon.modelConversionCache(tool)
+    for n, (path, ext) in enumerate(job['items']):
+        if addon.OT_ImportModels.importModelFile(context, pathlib.Path(path), ext, cache):
+            imported += 1
+        else:
+            errors += 1
+        print("ALT_BackgroundWorker: {0}/{1} {2}".format(n+1, len(job['items']), path))
+    collections = list(context.scene.collection.children)
+    objects = list(context.scene.collection.objects)
+    bpy.data.libraries.write(job['output'], set(collections) | set(objects), fake_user=True, path_remap='ABSOLUTE')
+    return {'imported': imported, 'errors': errors, 'cacheHits': cache.hits if cache != None else 0, 'collections': [coll.name for coll in collections], 'objects': [obj.name for obj in objects]}
+
+
+jobKinds = {
+    'pbr': pbrShard,
+    'proxy': proxyShard,
+    'models': modelsShard,
+}
+
+
+def main(argv):
+    jobPath = argv[argv.index('--') + 1]
+    with open(jobPath) as f:
+        job = json.load(f)
+    addon = loadAddon(job['addonDir'])
+    tool = bpy.context.scene.assetlibrarytools
+    applySettings(tool, job['tool'])
+    summary = jobKinds[job['kind']](addon, tool, job)
+    # The summary is written last, the blender that started this worker only trusts the output if it exists
+    with open(job['output'] + '.json', 'w') as f:
+        json.dump(summary, f)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -1,9 +1,12 @@
 import csv
-import copy
+import collections
 import zipfile
 import os
-import re
 import sys
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
 try:
     import requests
 except:
@@ -11,6 +14,7 @@ except:
     print('Module "requests" not found, attempting to install...')
     subprocess.check_call([sys.executable, "-m", "pip", "install", "requests"])
     import requests
+from requests.adapters import HTTPAdapter
 
 
 # Converts the string "None" to Nonetype
@@ -28,149 +32,613 @@ def strToBool(x):
         return False
 
 
-# Removes any items from the assets list that dont contain the specified keyword in assetId
-def filterByKeyword(assets, keyword):
-    i = 0
-    while i < len(assets):
-        if keyword.upper() not in assets[i][0].upper():
-            assets.pop(i)
+# Compact record for one row of the asset data csv, size is converted to an int
+Asset = collections.namedtuple('Asset', ['assetId', 'downloadAttribute', 'filetype', 'size', 'downloadLink', 'rawLink'])
+
+
+# The parsed asset data csv, with indexes of the assets by download attribute and by file extension
+class Catalog():
+    
+    def __init__(self, rows):
+        self.assets = []
+        self.byAttribute = {}
+        self.byExtension = {}
+        for row in rows:
+            asset = Asset(row[0], row[1], row[2], int(row[3] or 0), row[4], row[5])
+            self.byAttribute.setdefault(asset.downloadAttribute, []).append(len(self.assets))
+            self.byExtension.setdefault(asset.filetype.upper(), []).append(len(self.assets))
+            self.assets.append(asset)
+    
+    def __len__(self):
+        return len(self.assets)
+    
+    # Lazily yields the assets matching all filters that are not None in a single pass
+    # Only the smallest index that applies is walked, the remaining filters are checked on each of its assets
+    def filter(self, keyword=None, attribute=None, extension=None):
+        candidates = range(len(self.assets))
+        if attribute != None:
+            candidates = self.byAttribute.get(attribute, [])
+        if extension != None:
+            extension = extension.upper()
+            extensionCandidates = self.byExtension.get(extension, [])
+            if len(extensionCandidates) < len(candidates):
+                candidates = extensionCandidates
+        if keyword != None:
+            keyword = keyword.upper()
+        for index in candidates:
+            asset = self.assets[index]
+            if keyword != None and keyword not in asset.assetId.upper():
+                continue
+            if attribute != None and asset.downloadAttribute != attribute:
+                continue
+            if extension != None and asset.filetype.upper() != extension:
+                continue
+            yield asset
+
+
+# Returns a list of the assets in the catalog matching assetfilters = [keyword, downloadAttribute, fileExtension], None = dont filter
+def getAssetsByFilters(catalog, assetfilters):
+    return list(catalog.filter(assetfilters[0], assetfilters[1], assetfilters[2]))
+
+
+# Where the asset data csv is downloaded from
+CATALOG_URL = 'https://ambientcg.com/api/v2/downloads_csv'
+
+
+# Size of the buffer used when streaming downloads to disk, memory use stays at roughly this per download worker
+CHUNK_SIZE = 1024*1024
+
+
+# (connect, read) timeouts in seconds for asset downloads, the read timeout is the longest wait for the next bytes, not for the whole file
+# A stalled connection then fails the asset (to be retried from the journal) instead of holding a worker and its pooled connection forever
+DOWNLOAD_TIMEOUT = (10, 60)
+
+
+# Token bucket shared by all download workers to keep the combined download rate under bytesPerSecond
+# Workers take tokens for every chunk they receive, if there are not enough the worker sleeps until the bucket has refilled
+# Taking more tokens than are available puts the bucket in debt, so chunks larger than the bucket still work and the average rate is kept
+class RateLimiter():
+    
+    def __init__(self, bytesPerSecond):
+        self.rate = float(bytesPerSecond)
+        self.capacity = self.rate # Allow bursts of up to 1 second worth of data
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def consume(self, n):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= n
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+# Orders the assets to download
+# 'name': sorted by assetId, 'smallest': smallest files first for fast early results, 'largest': largest files first to keep the connections busy
+def scheduleAssets(assets, order='name'):
+    if order == 'smallest':
+        return sorted(assets, key=lambda i: (i[3], i[0], i[1]))
+    if order == 'largest':
+        return sorted(assets, key=lambda i: (-i[3], i[0], i[1]))
+    return sorted(assets)
+
+
+# Creates a session that keeps connections alive and shares them between all download workers
+# pool_maxsize limits the number of open connections per host, pool_block makes extra workers wait for a free connection
+def createSession(workers):
+    session = requests.Session()
+    session.headers.update({'User-Agent' : 'LJ3DSCRIPT'})
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, pool_block=True)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# Name of the journal file kept in the save location while a download run is in progress
+JOURNAL_NAME = '.ALT_CC0AssetDownloader_journal.jsonl'
+
+
+# Append-only journal of a download run
+# The first line holds the filters and the planned assets, every following line records an asset changing state (inflight/done/failed)
+# Assets in the plan without a "done" line are still queued, so an interrupted run can be picked up without downloading the asset data csv again
+class Journal():
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+    
+    # Returns the assets that are not done yet if the journal exists and was written with the same filters, otherwise None
+    def load(self, assetfilters):
+        if not os.path.isfile(self.path):
+            return None
+        plan = None
+        done = set()
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError: # Last line may be cut off if the previous run was killed while writing it
+                    continue
+                if 'plan' in entry:
+                    if entry['filters'] != assetfilters:
+                        return None
+                    plan = entry['plan']
+                elif entry['state'] == 'done':
+                    done.add(entry['asset'])
+        if plan == None:
+            return None
+        return [Asset(*i) for i in plan if i[0]+'_'+i[1] not in done]
+    
+    # Starts a new journal containing only the assets that are about to be downloaded
+    def begin(self, assets, assetfilters):
+        self.file = open(self.path, 'w')
+        self.file.write(json.dumps({'filters': assetfilters, 'plan': [list(i) for i in assets]}) + '\n')
+        self.file.flush()
+    
+    def record(self, i, state):
+        if self.file == None:
+            return
+        with self.lock:
+            self.file.write(json.dumps({'asset': i[0]+'_'+i[1], 'state': state}) + '\n')
+            self.file.flush()
+    
+    # Closes the journal, it is only deleted if every asset finished so failed assets get retried on the next run
+    def end(self, complete):
+        if self.file == None:
+            return
+        self.file.close()
+        self.file = None
+        if complete:
+            os.remove(self.path)
+
+
+# Reports what the downloader is doing
+# Normally messages are printed for a person to read, in headless mode every message and progress update is printed as a JSON object on its own line instead:
+# {"event": "plan"/"start"/"progress"/"skip"/"finish"/"done"/"log", ...}, with byte counts, throughput in bytes per second and ETA in seconds
+class Progress():
+    
+    interval = 0.5 # Minimum time in seconds between two "progress" events
+    
+    def __init__(self, headless=False, stream=None):
+        self.headless = headless
+        self.stream = stream if stream != None else sys.stdout
+        self.lock = threading.Lock()
+        self.startTime = time.time()
+        self.lastReport = 0
+        self.plannedBytes = 0
+        self.plannedAssets = 0
+        self.doneBytes = 0 # Bytes downloaded in this run
+        self.skippedBytes = 0
+        self.finishedAssets = 0
+        self.failedAssets = 0
+        self.unzipSeconds = 0 # Time spent unzipping, summed over all unzip workers
+    
+    def emit(self, event, **fields):
+        fields['event'] = event
+        with self.lock:
+            self.stream.write(json.dumps(fields) + '\n')
+            self.stream.flush()
+    
+    def log(self, message):
+        if self.headless:
+            self.emit('log', message=message)
         else:
-            i+=1
-    return assets
-
-
-# Removes any items from the assets list that dont have the specified attribute
-def filterByDownloadAttribute(assets, attribute):
-    i = 0
-    while i < len(assets):
-        if assets[i][1] != attribute:
-            assets.pop(i)
+            print(message)
+    
+    def throughput(self):
+        elapsed = time.time() - self.startTime
+        return self.doneBytes / elapsed if elapsed > 0 else 0
+    
+    def eta(self):
+        throughput = self.throughput()
+        if throughput <= 0:
+            return None
+        return max(0, self.plannedBytes - self.skippedBytes - self.doneBytes) / throughput
+    
+    def plan(self, assets):
+        self.startTime = time.time()
+        self.plannedAssets = len(assets)
+        self.plannedBytes = sum(i[3] for i in assets)
+        if self.headless:
+            self.emit('plan', assets=self.plannedAssets, bytes=self.plannedBytes)
+    
+    def started(self, i):
+        if self.headless:
+            self.emit('start', asset=i[0]+'_'+i[1], bytes=i[3])
         else:
-            i+=1
-    return assets
-
-
-# Removes any items from the assets list that dont have the specified file extension
-def filterByFileExtension(assets, extension):
-    i = 0
-    while i < len(assets):
-        if assets[i][2].upper() != extension.upper():
-            assets.pop(i)
-        else:
-            i+=1
-    return assets
-
-
-# Calls the above filtering functions if the inputs for those filters are not None
-def getAssetsByFilters(assets, assetfilters):
-    assetsCopy = copy.deepcopy(assets) # Deepcopy to avoid modifying original assets list (Not really important to do this)
-    if assetfilters[0] != None:
-        assetsCopy = filterByKeyword(assetsCopy, assetfilters[0])
-    if assetfilters[1] != None:
-        assetsCopy = filterByDownloadAttribute(assetsCopy, assetfilters[1])
-    if assetfilters[2] != None:
-        assetsCopy = filterByFileExtension(assetsCopy, assetfilters[2])
-    return assetsCopy
-
-
-def download(assets, saveLocation, unZip, deleteZips, skipDuplicates):
-    print("Downloading...")
-    for i in assets: # i = ['assetId', 'downloadAttribute', 'filetype', 'size', 'downloadLink', 'rawLink']
-        fileExists = False
-        if os.path.isdir(saveLocation+i[0]+'_'+i[1]):
-            fileExists = True
-        if os.path.isdir(saveLocation+i[0]+'_'+i[1]+'.'+i[2]):
-            fileExists = True
-
-        if (fileExists == False) or (skipDuplicates == False):
-            try:
-                print("Downloading {0}_{1} from {2}".format(i[0], i[1], i[4]))
-                url = i[5]
-                r = requests.get(url, allow_redirects=True)
-                open(saveLocation+i[0]+'_'+i[1]+'.'+i[2], 'wb').write(r.content) #i [0]+'_'+i[1]+'.'+i[2] = assetID_downloadAttribute.extension
-            except Exception as e:
-                print("Failed to download {0}_{1} from {2}".format(i[0], i[1], i[4]))
-                print(e)
-            if i[2] == "zip" and unZip == True:
-                try:
-                    print("Unzipping {0}_{1}.{2}".format(i[0],i[1],i[2]))
-                    with zipfile.ZipFile(saveLocation+i[0]+'_'+i[1]+'.'+i[2], 'r') as zip_ref:
-                        zip_ref.extractall(saveLocation+i[0]+'_'+i[1])
-                    if deleteZips == True:
-                        os.remove(saveLocation+i[0]+'_'+i[1]+'.'+i[2])
-                except Exception as e:
-                    print("Failed to unzip {0}_{1}.{2}".format(i[0], i[1], i[2]))
-                    print(e)
+            print("Downloading {0}_{1} from {2}".format(i[0], i[1], i[4]))
+    
+    # Called by the download workers for every chunk written to disk
+    def received(self, i, n):
+        report = False
+        with self.lock:
+            self.doneBytes += n
+            now = time.time()
+            if now - self.lastReport >= self.interval:
+                self.lastReport = now
+                report = True
+        if report and self.headless:
+            self.emit('progress', asset=i[0]+'_'+i[1], bytes=self.doneBytes, plannedBytes=self.plannedBytes-self.skippedBytes, throughput=self.throughput(), eta=self.eta())
+    
+    def skipped(self, i, saveLocation):
+        with self.lock:
+            self.skippedBytes += i[3]
+            self.finishedAssets += 1
+        if self.headless:
+            self.emit('skip', asset=i[0]+'_'+i[1])
         else:
             print("Skipping {0} since it already exists".format(saveLocation+i[0]+'_'+i[1]))
+    
+    def unzipped(self, i, seconds):
+        with self.lock:
+            self.unzipSeconds += seconds
+    
+    def finished(self, i, ok):
+        with self.lock:
+            if ok:
+                self.finishedAssets += 1
+            else:
+                self.failedAssets += 1
+                self.skippedBytes += i[3]
+        if self.headless:
+            self.emit('finish', asset=i[0]+'_'+i[1], ok=ok, finished=self.finishedAssets, failed=self.failedAssets, assets=self.plannedAssets, throughput=self.throughput(), eta=self.eta())
+    
+    def done(self):
+        seconds = time.time() - self.startTime
+        if self.headless:
+            self.emit('done', ok=self.failedAssets == 0, finished=self.finishedAssets, failed=self.failedAssets, bytes=self.doneBytes, seconds=seconds, throughput=self.throughput(), unzipSeconds=self.unzipSeconds)
+        else:
+            print("Done, {0} assets finished, {1} failed, {2} bytes downloaded in {3:.1f} seconds".format(self.finishedAssets, self.failedAssets, self.doneBytes, seconds))
+
+
+# Name of the manifest file kept in the save location
+MANIFEST_NAME = '.ALT_CC0AssetDownloader_manifest.jsonl'
+
+
+# Record of the assets already in the save location, keyed by assetId_downloadAttribute
+# Each entry holds the size the asset data csv gave for the file and whether it was downloaded or also unzipped
+# The manifest is read into memory once per run, so duplicate checks are dictionary lookups instead of filesystem calls
+# Entries are appended as assets complete and the file is compacted when the run ends
+class Manifest():
+    
+    def __init__(self, saveLocation):
+        self.path = saveLocation + MANIFEST_NAME
+        self.saveLocation = saveLocation
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.file = None
+    
+    def load(self):
+        if not os.path.isfile(self.path):
+            self.seed()
+            return
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError: # Last line may be cut off if the previous run was killed while writing it
+                    continue
+                self.entries[entry['asset']] = entry
+    
+    # Builds the first manifest for a save location that already contains assets from a single directory listing
+    # An extracted folder always marks its asset unzipped, a file next to it (a zip kept with deleteZips off) only gives the size
+    # Sizes of unzipped folders without their zip are unknown, those entries are trusted as they are
+    def seed(self):
+        if not os.path.isdir(self.saveLocation):
+            return
+        for entry in os.scandir(self.saveLocation):
+            if entry.name.startswith('.') or entry.name.endswith('.part'):
+                continue
+            if entry.is_dir():
+                self.entries.setdefault(entry.name, {'asset': entry.name, 'size': None})['state'] = 'unzipped'
+            elif entry.is_file() and '.' in entry.name:
+                key = entry.name.rsplit('.', 1)[0]
+                self.entries.setdefault(key, {'asset': key, 'state': 'downloaded'})['size'] = entry.stat().st_size
+    
+    # Returns True if the asset is recorded with the size the asset data csv gives for it, and unzipped if it has to be
+    def isComplete(self, i, unZip):
+        entry = self.entries.get(i[0]+'_'+i[1])
+        if entry == None:
+            return False
+        if entry['size'] != None and entry['size'] != i[3]:
+            return False
+        if i[2] == "zip" and unZip == True:
+            return entry['state'] == 'unzipped'
+        return True
+    
+    def record(self, i, state):
+        entry = {'asset': i[0]+'_'+i[1], 'size': i[3], 'state': state}
+        with self.lock:
+            self.entries[entry['asset']] = entry
+            if self.file == None:
+                self.file = open(self.path, 'a')
+            self.file.write(json.dumps(entry) + '\n')
+            self.file.flush()
+    
+    # Rewrites the manifest with one line per asset
+    def close(self):
+        with self.lock:
+            if self.file != None:
+                self.file.close()
+                self.file = None
+            if not self.entries:
+                return
+            with open(self.path + '.part', 'w') as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry) + '\n')
+            os.replace(self.path + '.part', self.path)
+
+
+# Size of the complete file a response is for, or None if the server doesnt say
+# That is the total of Content-Range for a partial response, otherwise Content-Length (unless the body is compressed in transit)
+def responseSize(r):
+    if r.status_code == 206:
+        total = r.headers.get('Content-Range', '').rpartition('/')[2]
+        return int(total) if total.isdigit() else None
+    length = r.headers.get('Content-Length', '')
+    if length.isdigit() and r.headers.get('Content-Encoding', 'identity') == 'identity':
+        return int(length)
+    return None
+
+
+# Streams url to filePath in chunks of CHUNK_SIZE
+# The data is written to filePath.part first and only renamed to filePath once it is complete, so an interrupted download never leaves a truncated file behind
+# If a .part file is left over from an interrupted run the download is resumed from where it stopped using a HTTP Range request
+# The finished file is checked against the size the server gives for this response (Content-Range total or Content-Length),
+# not the catalog size, which can be out of date when an asset is republished. If it differs the file is deleted and an error is raised
+# onChunk(n) is called with the size of every chunk written
+def streamToFile(session, url, filePath, onChunk=None):
+    tmpPath = filePath + '.part'
+    resumeFrom = 0
+    if os.path.isfile(tmpPath):
+        resumeFrom = os.path.getsize(tmpPath)
+    headers = {}
+    if resumeFrom > 0:
+        headers['Range'] = 'bytes={0}-'.format(resumeFrom)
+    with session.get(url, allow_redirects=True, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT) as r:
+        if r.status_code == 416: # Range not satisfiable, the .part file is no use so start again from zero
+            os.remove(tmpPath)
+            return streamToFile(session, url, filePath, onChunk)
+        r.raise_for_status()
+        mode = 'ab' if r.status_code == 206 else 'wb' # Servers that ignore Range send the whole file with 200
+        expectedSize = responseSize(r)
+        with open(tmpPath, mode) as f:
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                if onChunk != None:
+                    onChunk(len(chunk))
+            f.flush()
+            os.fsync(f.fileno())
+    size = os.path.getsize(tmpPath)
+    if expectedSize != None and size != expectedSize:
+        os.remove(tmpPath)
+        raise ValueError("Downloaded file is {0} bytes, expected {1} bytes".format(size, expectedSize))
+    os.replace(tmpPath, filePath)
+
+
+# Unzips a downloaded asset and deletes the zip afterwards if deleteZips is True, runs on the unzip workers
+def unzipAsset(i, saveLocation, deleteZips, journal, manifest, progress):
+    try:
+        progress.log("Unzipping {0}_{1}.{2}".format(i[0],i[1],i[2]))
+        unzipStart = time.time()
+        with zipfile.ZipFile(saveLocation+i[0]+'_'+i[1]+'.'+i[2], 'r') as zip_ref:
+            zip_ref.extractall(saveLocation+i[0]+'_'+i[1])
+        progress.unzipped(i, time.time() - unzipStart)
+        if deleteZips == True:
+            os.remove(saveLocation+i[0]+'_'+i[1]+'.'+i[2])
+    except Exception as e:
+        progress.log("Failed to unzip {0}_{1}.{2}".format(i[0], i[1], i[2]))
+        progress.log(str(e))
+        if journal != None:
+            journal.record(i, 'failed')
+        progress.finished(i, False)
+        return False
+    if manifest != None:
+        manifest.record(i, 'unzipped')
+    if journal != None:
+        journal.record(i, 'done')
+    progress.finished(i, True)
+    return True
+
+
+# Downloads a single asset, i = ['assetId', 'downloadAttribute', 'filetype', 'size', 'downloadLink', 'rawLink']
+# Zips are handed over to unzipExecutor so the download worker can move on to the next asset, the future of the unzip is returned in that case
+def downloadAsset(session, i, saveLocation, unZip, deleteZips, skipDuplicates, journal, unzipExecutor, manifest, progress, rateLimiter=None):
+    fileExists = False
+    if manifest != None:
+        fileExists = manifest.isComplete(i, unZip)
+
+    if (fileExists == False) or (skipDuplicates == False):
+        try:
+            progress.started(i)
+            if journal != None:
+                journal.record(i, 'inflight')
+            url = i[5]
+            def onChunk(n):
+                if rateLimiter != None:
+                    rateLimiter.consume(n)
+                progress.received(i, n)
+            streamToFile(session, url, saveLocation+i[0]+'_'+i[1]+'.'+i[2], onChunk) #i [0]+'_'+i[1]+'.'+i[2] = assetID_downloadAttribute.extension
+        except Exception as e:
+            progress.log("Failed to download {0}_{1} from {2}".format(i[0], i[1], i[4]))
+            progress.log(str(e))
+            if journal != None:
+                journal.record(i, 'failed')
+            progress.finished(i, False)
+            return False
+        if manifest != None:
+            manifest.record(i, 'downloaded')
+        if i[2] == "zip" and unZip == True:
+            if unzipExecutor != None:
+                return unzipExecutor.submit(unzipAsset, i, saveLocation, deleteZips, journal, manifest, progress)
+            return unzipAsset(i, saveLocation, deleteZips, journal, manifest, progress)
+        progress.finished(i, True)
+    else:
+        progress.skipped(i, saveLocation)
+    if journal != None:
+        journal.record(i, 'done')
+    return True
+
+
+# Downloads the assets using (workers) threads at once, workers = 1 downloads them one after another
+# Downloaded zips are queued to a separate pool of (unzipWorkers) threads, so extracting one asset overlaps with downloading the next ones
+# Assets already listed in the manifest of the save location are skipped if skipDuplicates is True
+# maxRate limits the combined download rate of all workers in bytes per second (0 = unlimited), assets are downloaded in the order given
+# Returns True if every asset was downloaded (or skipped) successfully
+def download(assets, saveLocation, unZip, deleteZips, skipDuplicates, workers=1, journal=None, unzipWorkers=1, progress=None, maxRate=0):
+    if progress == None:
+        progress = Progress()
+    progress.log("Downloading...")
+    progress.plan(assets)
+    workers = max(1, workers)
+    session = createSession(workers)
+    rateLimiter = RateLimiter(maxRate) if maxRate > 0 else None
+    manifest = Manifest(saveLocation)
+    manifest.load()
+    with session, ThreadPoolExecutor(max_workers=max(1, unzipWorkers)) as unzipExecutor, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(downloadAsset, session, i, saveLocation, unZip, deleteZips, skipDuplicates, journal, unzipExecutor, manifest, progress, rateLimiter) for i in assets]
+        results = [f.result() for f in futures]
+        results = [r.result() if isinstance(r, Future) else r for r in results]
+    manifest.close()
+    progress.done()
+    return all(results)
+
+
+# Directory the asset data csv is cached in between runs
+def getCacheDir():
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    else:
+        base = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'AssetLibraryTools')
 
 
+# Download asset data csv file
+# CSV file is formatted like this:
+#['assetId', 'downloadAttribute', 'filetype', 'size', 'downloadLink', 'rawLink']
+# For some reason it wont download the file unless you send a "User-Agent" header
+# The csv is cached in cacheDir and revalidated with ETag/If-Modified-Since, so the body is only sent again when it changed upstream
+# If the cached copy is younger than maxAge seconds it is used without contacting the server at all (maxAge = 0 always revalidates)
+def getCatalog(url=CATALOG_URL, cacheDir=None, maxAge=0, progress=None):
+    if progress == None:
+        progress = Progress()
+    if cacheDir == None:
+        cacheDir = getCacheDir()
+    os.makedirs(cacheDir, exist_ok=True)
+    csvPath = os.path.join(cacheDir, 'downloads.csv')
+    metaPath = os.path.join(cacheDir, 'downloads.csv.json')
+    meta = {}
+    if os.path.isfile(csvPath) and os.path.isfile(metaPath):
+        with open(metaPath, 'r') as f:
+            meta = json.load(f)
+    
+    if meta and maxAge > 0 and time.time() - meta.get('fetched', 0) < maxAge:
+        progress.log("Using cached asset data from {0}\n".format(csvPath))
+    else:
+        progress.log("Downloading asset data from {0}\n".format(url))
+        headers = {'User-Agent' : 'LJ3DSCRIPT'}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('lastModified'):
+            headers['If-Modified-Since'] = meta['lastModified']
+        try:
+            r = requests.get(url, allow_redirects=True, headers=headers, timeout=30)
+            r.raise_for_status()
+        except Exception as e:
+            if not meta:
+                raise
+            progress.log("Failed to download asset data, using cached copy from {0}".format(csvPath))
+            progress.log(str(e))
+            r = None
+        if r != None and r.status_code == 304:
+            progress.log("Cached asset data is up to date")
+        elif r != None:
+            open(csvPath + '.part', 'wb').write(r.content) # Save downloaded file to disk
+            os.replace(csvPath + '.part', csvPath)
+            meta = {'etag': r.headers.get('ETag'), 'lastModified': r.headers.get('Last-Modified')}
+        if r != None:
+            meta['fetched'] = time.time()
+            with open(metaPath, 'w') as f:
+                json.dump(meta, f)
+    
+    # Open downloaded asset data csv file
+    with open(csvPath, newline='') as f:
+        reader = csv.reader(f)
+        next(reader) # Skip the 1st row since its not asset data, its column info
+        catalog = Catalog(reader)
+    progress.log("Loaded csv file and found {0} assets\n".format(len(catalog)))
+    return catalog
+
 
 yesInputs = ["y", "yes", "yes please"]
 noInputs = ["n", "no", "no thank you"]
 
 
-#AssetLibraryTools will do the input checking for this script, we just need to do some conversions
-print(sys.argv)
-saveLocation = sys.argv[1] + '/'
-keywordFilter = strToNoneType(sys.argv[2])
-attributeFilter = strToNoneType(sys.argv[3])
-extensionFilter = strToNoneType(sys.argv[4])
-unZip = strToBool(sys.argv[5])
-deleteZips = strToBool(sys.argv[6])
-skipDuplicates = strToBool(sys.argv[6])
-
-
-# Download asset data csv file
-# CSV file is formatted like this:
-#['assetId', 'downloadAttribute', 'filetype', 'size', 'downloadLink', 'rawLink']
-# For some reason it wont download the file unless you send a "User-Agent" header
-print("Downloading asset data from https://ambientcg.com/api/v2/downloads_csv\n")
-headers = {'User-Agent' : 'LJ3DSCRIPT'}
-url = 'https://ambientcg.com/api/v2/downloads_csv'
-r = requests.get(url, allow_redirects=True, headers=headers)
-filename = re.findall('filename=(.+)', r.headers.get('content-disposition'))[0]
-open(filename, 'wb').write(r.content) # Save downloaded file to disk
-
-
-# Open downloaded asset data csv file
-with open(filename, newline='') as f:
-    reader = csv.reader(f)
-    assets = list(reader)
-assets.pop(0) # Remove the 1st item since its not asset data, its column info
-print("Loaded csv file and found {0} assets\n".format(len(assets)))
-
-
-# Filter and sort the assets
-filteredAssets = getAssetsByFilters(assets, [keywordFilter, attributeFilter, extensionFilter])
-filteredAssets.sort()
-
-
-# Get the total size in bytes of the filtered assets
-filteredTotalSize = 0
-for i in filteredAssets:
-    filteredTotalSize += int(i[3])
-print("=====\nFound {0} assets that match the filters, with a combined size of {1} bytes ({2} gigabytes)".format(len(filteredAssets), filteredTotalSize, filteredTotalSize/1e+9))
-
-
-print("=====\nDisplay asset names? (y/n)")
-while True:
-    userInput = input()
-    if userInput.lower() in yesInputs:
-        for i in filteredAssets:
-            print(i[0]+"_"+i[1])
-        break
-    if userInput in noInputs:
-        break
-    print("Invalid input")
-
-
-print("=====\nWould you like to download these assets? (y/n)")
-while True:
-    userInput = input()
-    if userInput.lower() in yesInputs:
-        download(filteredAssets, saveLocation, unZip, deleteZips, skipDuplicates)
-        break
-    if userInput in noInputs:
-        break
-    print("Invalid input")
+# Asks a yes/no question until a valid answer is given
+def askYesNo(question):
+    print(question)
+    while True:
+        userInput = input()
+        if userInput.lower() in yesInputs:
+            return True
+        if userInput.lower() in noInputs:
+            return False
+        print("Invalid input")
+
+
+def main(argv):
+    #AssetLibraryTools will do the input checking for this script, we just need to do some conversions
+    saveLocation = argv[1] + '/'
+    keywordFilter = strToNoneType(argv[2])
+    attributeFilter = strToNoneType(argv[3])
+    extensionFilter = strToNoneType(argv[4])
+    unZip = strToBool(argv[5])
+    deleteZips = strToBool(argv[6])
+    skipDuplicates = strToBool(argv[7])
+    downloadWorkers = int(argv[8])
+    catalogMaxAge = int(argv[9])*60 # Given in minutes
+    unzipWorkers = int(argv[10])
+    headless = strToBool(argv[11]) # Dont ask anything, download straight away and report progress as JSON lines
+    maxRate = float(argv[12])*1e+6 # Given in megabytes per second, 0 = unlimited
+    downloadOrder = argv[13] # See scheduleAssets
+    progress = Progress(headless)
+    if not headless:
+        print(argv)
+    
+    # Pick up an interrupted run from its journal if there is one, otherwise filter the assets from the asset data csv
+    assetFilters = [keywordFilter, attributeFilter, extensionFilter]
+    journal = Journal(saveLocation + JOURNAL_NAME)
+    filteredAssets = journal.load(assetFilters)
+    if filteredAssets != None:
+        progress.log("Resuming interrupted download run from {0}".format(journal.path))
+    else:
+        catalog = getCatalog(maxAge=catalogMaxAge, progress=progress)
+        filteredAssets = getAssetsByFilters(catalog, assetFilters)
+    filteredAssets = scheduleAssets(filteredAssets, downloadOrder)
+    
+    # Get the total size in bytes of the filtered assets
+    filteredTotalSize = 0
+    for i in filteredAssets:
+        filteredTotalSize += i.size
+    progress.log("Found {0} assets that match the filters, with a combined size of {1} bytes ({2} gigabytes)".format(len(filteredAssets), filteredTotalSize, filteredTotalSize/1e+9))
+    
+    if not headless:
+        if askYesNo("=====\nDisplay asset names? (y/n)"):
+            for i in filteredAssets:
+                print(i[0]+"_"+i[1])
+        if not askYesNo("=====\nWould you like to download these assets? (y/n)"):
+            return True
+    
+    journal.begin(filteredAssets, assetFilters)
+    complete = download(filteredAssets, saveLocation, unZip, deleteZips, skipDuplicates, downloadWorkers, journal, unzipWorkers, progress, maxRate)
+    journal.end(complete)
+    return complete
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main(sys.argv) else 1)
@@ -26,52 +26,25 @@ from bpy.types import (Panel,
                        PropertyGroup,
                        )
 import pathlib
-import re
 import os
 import time
 import random
+import sys
+import json
+import queue
+import threading
+import subprocess
+import tempfile
+import shutil
+import numpy as np
+from .textureSets import scanTextureSets, selectTextureFiles, proxyPath
+from .modelCache import ModelCache
 
 
 # ------------------------------------------------------------------------
 #    Stuff
 # ------------------------------------------------------------------------ 
 
-diffNames = ["diffuse", "diff", "albedo", "base", "col", "color"]
-sssNames = ["sss", "subsurface"]
-metNames = ["metallic", "metalness", "metal", "mtl", "met"]
-specNames = ["specularity", "specular", "spec", "spc"]
-roughNames = ["roughness", "rough", "rgh", "gloss", "glossy", "glossiness"]
-normNames = ["normal", "nor", "nrm", "nrml", "norm"]
-dispNames = ["displacement", "displace", "disp", "dsp", "height", "heightmap", "bump", "bmp"]
-alphaNames = ["alpha", "opacity"]
-emissiveNames = ["emissive", "emission"]
-
-nameLists = [diffNames, sssNames, metNames, specNames, roughNames, normNames, dispNames, alphaNames, emissiveNames]
-texTypes = ["diff", "sss", "met", "spec", "rough", "norm", "disp", "alpha", "emission"]
-
-# Find the type of PBR texture a file is based on its name
-def FindPBRTextureType(fname):
-    PBRTT = None
-    # Remove digits
-    fname = ''.join(i for i in fname if not i.isdigit())
-    # Separate CamelCase by space
-    fname = re.sub("([a-z])([A-Z])","\g<1> \g<2>",fname)
-    # Replace common separators with SPACE
-    seperators = ['_', '.', '-', '__', '--', '#']
-    for sep in seperators:
-        fname = fname.replace(sep, ' ')
-    # Set entire string to lower case
-    fname = fname.lower()
-    # Find PBRTT
-    i = 0
-    for nameList in nameLists:
-        for name in nameList:
-            if name in fname:
-                PBRTT = texTypes[i]
-        i+=1
-    return PBRTT
-
-
 # Display a message in the blender UI
 def DisplayMessageBox(message = "", title = "Info", icon = 'INFO'):
     def draw(self, context):
@@ -79,6 +52,74 @@ def DisplayMessageBox(message = "", title = "Info", icon = 'INFO'):
     bpy.context.window_manager.popup_menu(draw, title = title, icon = icon)
 
 
+# Image datablocks loaded during a batch import, keyed by resolved file path, modification time and colour space
+# Textures shared between texture sets (a common normal or noise map) are only loaded once, every material using them gets the same image datablock
+# proxies maps resolved texture paths to proxy textures, a proxy is loaded instead of its texture if it exists
+# Images loaded from a proxy remember both paths (ALT_full_res and ALT_proxy), for OT_SwapProxyTextures
+class imageCache():
+    
+    def __init__(self, proxies=None):
+        self.images = {}
+        self.proxies = proxies if proxies != None else {}
+    
+    def load(self, path, nonColor=False):
+        path = pathlib.Path(path).resolve()
+        proxy = self.proxies.get(str(path))
+        if proxy != None and not os.path.isfile(proxy):
+            proxy = None
+        file = pathlib.Path(proxy) if proxy != None else path
+        key = (str(file), file.stat().st_mtime_ns, nonColor)
+        image = self.images.get(key)
+        if image != None:
+            try:
+                image.name # Raises ReferenceError if the image was deleted since it was loaded
+                return image
+            except ReferenceError:
+                pass
+        image = bpy.data.images.load(str(file))
+        if nonColor:
+            image.colorspace_settings.name = 'Non-Color'
+        if proxy != None:
+            image['ALT_full_res'] = str(path)
+            image['ALT_proxy'] = proxy
+        self.images[key] = image
+        return image
+    
+    # Returns the image already in the cache for the same file and colour space as image (one appended from a background worker's .blend),
+    # or adds image to the cache and returns it if there is none
+    def adopt(self, image):
+        path = pathlib.Path(bpy.path.abspath(image.filepath)).resolve()
+        try:
+            key = (str(path), path.stat().st_mtime_ns, image.colorspace_settings.name == 'Non-Color')
+        except OSError:
+            return image
+        existing = self.images.get(key)
+        if existing != None:
+            try:
+                existing.name # Raises ReferenceError if the image was deleted since it was loaded
+                return existing
+            except ReferenceError:
+                pass
+        self.images[key] = image
+        return image
+
+
+# Texture slots of the principled material, in the order their nodes are laid out:
+# (texture type, name of the image texture node, tool property that turns the slot on, loaded as Non-Color, principled BSDF input)
+# Roughness, normal and displacement textures get extra nodes between the texture and the shader, see shaderSetup.buildPrincipledTree
+principledSlots = [
+    ("diff", "node_imTexDiffuse", "import_diff", False, 'Base Color'),
+    ("sss", "node_imTexSSS", "import_sss", True, 'Subsurface'),
+    ("met", "node_imTexMetallic", "import_met", True, 'Metallic'),
+    ("spec", "node_imTexSpecular", "import_spec", True, 'Specular'),
+    ("rough", "node_imTexRoughness", "import_rough", True, 'Roughness'),
+    ("emission", "node_imTexEmission", "import_emission", False, 'Emission'),
+    ("alpha", "node_imTexAlpha", "import_alpha", True, 'Alpha'),
+    ("norm", "node_imTexNormal", "import_norm", True, 'Normal'),
+    ("disp", "node_imTexDisplacement", "import_disp", True, None),
+]
+
+
 # Class with functions for setting up shaders
 class shaderSetup():
     
@@ -89,158 +130,407 @@ class shaderSetup():
         n.location = location
         return n
     
-    def setMapping(node):
-        tool = bpy.context.scene.assetlibrarytools
-        if tool.texture_mapping == 'Object':
+    def setMapping(node, mapping):
+        if mapping == 'Object':
                 node.projection = 'BOX'
                 node.projection_blend = 1
     
-    def simplePrincipledSetup(name, files):
-        tool = bpy.context.scene.assetlibrarytools
-        # Create a new empty material
-        mat = bpy.data.materials.new(name)
+    # Builds the node tree of a principled material with empty image texture nodes for the texture types in slotTypes
+    def buildPrincipledTree(mat, slotTypes, mapping, extraNodes):
         mat.use_nodes = True
         nodes = mat.node_tree.nodes
         links = mat.node_tree.links 
         nodes.clear() # Delete all nodes
         
-        # Load textures
-        diffuseTexture = None
-        sssTexture = None
-        metallicTexture = None
-        specularTexture = None
-        roughnessTexture = None
-        emissionTexture = None
-        alphaTexture = None
-        normalTexture = None
-        displacementTexture = None
-        for i in files:
-            t = FindPBRTextureType(i.name)
-            if t == "diff":
-                diffuseTexture = bpy.data.images.load(str(i))
-            elif t == "sss":
-                sssTexture = bpy.data.images.load(str(i))
-                sssTexture.colorspace_settings.name = 'Non-Color'
-            elif t == "met":
-                metallicTexture = bpy.data.images.load(str(i))
-                metallicTexture.colorspace_settings.name = 'Non-Color'
-            elif t == "spec":
-                specularTexture = bpy.data.images.load(str(i))
-                specularTexture.colorspace_settings.name = 'Non-Color'
-            elif t == "rough":
-                roughnessTexture = bpy.data.images.load(str(i))
-                roughnessTexture.colorspace_settings.name = 'Non-Color'
-            elif t == "emission":
-                emissionTexture = bpy.data.images.load(str(i))  
-            elif t == "alpha":
-                alphaTexture = bpy.data.images.load(str(i))
-                alphaTexture.colorspace_settings.name = 'Non-Color'
-            elif t == "norm":
-                normalTexture = bpy.data.images.load(str(i))
-                normalTexture.colorspace_settings.name = 'Non-Color'
-            elif t == "disp":
-                displacementTexture = bpy.data.images.load(str(i))
-                displacementTexture.colorspace_settings.name = 'Non-Color'
-        
         # Create base nodes
         node_output = shaderSetup.createNode(mat, "ShaderNodeOutputMaterial", "node_output", (250,0))
         node_principled = shaderSetup.createNode(mat, "ShaderNodeBsdfPrincipled", "node_principled", (-300,0))
         links.new(node_principled.outputs['BSDF'], node_output.inputs['Surface'])
         node_mapping = shaderSetup.createNode(mat, "ShaderNodeMapping", "node_mapping", (-1300,0))
         node_texCoord = shaderSetup.createNode(mat, "ShaderNodeTexCoord", "node_texCoord", (-1500,0))
-        links.new(node_texCoord.outputs[tool.texture_mapping], node_mapping.inputs['Vector'])
-        if tool.add_extranodes:
+        links.new(node_texCoord.outputs[mapping], node_mapping.inputs['Vector'])
+        if extraNodes:
             node_scaleValue = shaderSetup.createNode(mat, "ShaderNodeValue", "node_scaleValue", (-1500, -300))
             node_scaleValue.outputs['Value'].default_value = 1
             links.new(node_scaleValue.outputs['Value'], node_mapping.inputs['Scale'])
         
-        # Create, fill, and link texture nodes
+        # Create and link texture nodes
         imported_tex_nodes = 0
-        if diffuseTexture != None and tool.import_diff != False:
-            node_imTexDiffuse = shaderSetup.createNode(mat, "ShaderNodeTexImage", "node_imTexDiffuse", (-800,300-(300*imported_tex_nodes)))
-            node_imTexDiffuse.image = diffuseTexture
-            links.new(node_imTexDiffuse.outputs['Color'], node_principled.inputs['Base Color'])
-            links.new(node_mapping.outputs['Vector'], node_imTexDiffuse.inputs['Vector'])
-            shaderSetup.setMapping(node_imTexDiffuse)
-            imported_tex_nodes += 1
-            
-        if sssTexture != None and tool.import_sss != False:
-            node_imTexSSS = shaderSetup.createNode(mat, "ShaderNodeTexImage", "node_imTexSSS", (-800,300-(300*imported_tex_nodes)))
-            node_imTexSSS.image = sssTexture
-            links.new(node_imTexSSS.outputs['Color'], node_principled.inputs['Subsurface'])
-            links.new(node_mapping.outputs['Vector'], node_imTexSSS.inputs['Vector'])
-            shaderSetup.setMapping(node_imTexSSS)
-            imported_tex_nodes += 1
-            
-        if metallicTexture != None and tool.import_met != False:
-            node_imTexMetallic = shaderSetup.createNode(mat, "ShaderNodeTexImage", "node_imTexMetallic", (-800,300-(300*imported_tex_nodes)))
-            node_imTexMetallic.image = metallicTexture
-            links.new(node_imTexMetallic.outputs['Color'], node_principled.inputs['Metallic'])
-            links.new(node_mapping.outputs['Vector'], node_imTexMetallic.inputs['Vector'])
-            shaderSetup.setMapping(node_imTexMetallic)
-            imported_tex_nodes += 1
-            
-        if specularTexture != None and tool.import_spec != False:
-            node_imTexSpecular = shaderSetup.createNode(mat, "ShaderNodeTexImage", "node_imTexSpecular", (-800,300-(300*imported_tex_nodes)))
-            node_imTexSpecular.image = specularTexture
-            links.new(node_imTexSpecular.outputs['Color'], node_principled.inputs['Specular'])
-            links.new(node_mapping.outputs['Vector'], node_imTexSpecular.inputs['Vector'])
-            shaderSetup.setMapping(node_imTexSpecular)
-            imported_tex_nodes += 1
-            
-        if roughnessTexture != None and tool.import_rough != False:
-            node_imTexRoughness = shaderSetup.createNode(mat, "ShaderNodeTexImage", "node_imTexRoughness", (-800,300-(300*imported_tex_nodes)))
-            node_imTexRoughness.image = roughnessTexture
-            if tool.add_extranodes:
-                node_imTexRoughnessColourRamp = shaderSetup.createNode(mat, "ShaderNodeValToRGB", "node_imTexRoughnessColourRamp", (-550,300-(300*imported_tex_nodes)))
-                links.new(node_imTexRoughness.outputs['Color'], node_imTexRoughnessColourRamp.inputs['Fac'])
+        for texType, nodeName, prop, nonColor, shaderInput in principledSlots:
+            if texType not in slotTypes:
+                continue
+            y = 300-(300*imported_tex_nodes)
+            node_imTex = shaderSetup.createNode(mat, "ShaderNodeTexImage", nodeName, (-800,y))
+            if texType == "rough" and extraNodes:
+                node_imTexRoughnessColourRamp = shaderSetup.createNode(mat, "ShaderNodeValToRGB", "node_imTexRoughnessColourRamp", (-550,y))
+                links.new(node_imTex.outputs['Color'], node_imTexRoughnessColourRamp.inputs['Fac'])
                 links.new(node_imTexRoughnessColourRamp.outputs['Color'], node_principled.inputs['Roughness'])
+            elif texType == "norm":
+                node_normalMap = shaderSetup.createNode(mat, "ShaderNodeNormalMap", "node_normalMap", (-500,y))
+                links.new(node_imTex.outputs['Color'], node_normalMap.inputs['Color'])
+                links.new(node_normalMap.outputs['Normal'], node_principled.inputs['Normal'])
+            elif texType == "disp":
+                node_imTex.interpolation = 'Smart'
+                node_displacement = shaderSetup.createNode(mat, "ShaderNodeDisplacement", "node_displacement", (-200,-600))
+                links.new(node_imTex.outputs['Color'], node_displacement.inputs['Height'])
+                links.new(node_displacement.outputs['Displacement'], node_output.inputs['Displacement'])
             else:
-                links.new(node_imTexRoughness.outputs['Color'], node_principled.inputs['Roughness'])
-            links.new(node_mapping.outputs['Vector'], node_imTexRoughness.inputs['Vector'])
-            shaderSetup.setMapping(node_imTexRoughness)
-            imported_tex_nodes += 1
-            
-        if emissionTexture != None and tool.import_emission != False:
-            node_imTexEmission = shaderSetup.createNode(mat, "ShaderNodeTexImage", "node_imTexEmission", (-800,300-(300*imported_tex_nodes)))
-            node_imTexEmission.image = emissionTexture
-            links.new(node_imTexEmission.outputs['Color'], node_principled.inputs['Emission'])
-            links.new(node_mapping.outputs['Vector'], node_imTexEmission.inputs['Vector'])
-            shaderSetup.setMapping(node_imTexEmission)
-            imported_tex_nodes += 1
-            
-        if alphaTexture != None and tool.import_alpha != False:
-            node_imTexAlpha = shaderSetup.createNode(mat, "ShaderNodeTexImage", "node_imTexAlpha", (-800,300-(300*imported_tex_nodes)))
-            node_imTexAlpha.image = alphaTexture
-            links.new(node_imTexAlpha.outputs['Color'], node_principled.inputs['Alpha'])
-            links.new(node_mapping.outputs['Vector'], node_imTexAlpha.inputs['Vector'])
-            shaderSetup.setMapping(node_imTexAlpha)
-            imported_tex_nodes += 1
-            
-        if normalTexture != None and tool.import_norm != False:
-            node_imTexNormal = shaderSetup.createNode(mat, "ShaderNodeTexImage", "node_imTexNormal", (-800,300-(300*imported_tex_nodes)))
-            node_imTexNormal.image = normalTexture
-            node_normalMap = shaderSetup.createNode(mat, "ShaderNodeNormalMap", "node_normalMap", (-500,300-(300*imported_tex_nodes)))
-            links.new(node_imTexNormal.outputs['Color'], node_normalMap.inputs['Color'])
-            links.new(node_normalMap.outputs['Normal'], node_principled.inputs['Normal'])
-            links.new(node_mapping.outputs['Vector'], node_imTexNormal.inputs['Vector'])
-            shaderSetup.setMapping(node_imTexNormal)
-            imported_tex_nodes += 1
-            
-        if displacementTexture != None and tool.import_disp != False:
-            node_imTexDisplacement = shaderSetup.createNode(mat, "ShaderNodeTexImage", "node_imTexDisplacement", (-800,300-(300*imported_tex_nodes)))
-            node_imTexDisplacement.image = displacementTexture
-            node_imTexDisplacement.interpolation = 'Smart'
-            node_displacement = shaderSetup.createNode(mat, "ShaderNodeDisplacement", "node_displacement", (-200,-600))
-            links.new(node_imTexDisplacement.outputs['Color'], node_displacement.inputs['Height'])
-            links.new(node_displacement.outputs['Displacement'], node_output.inputs['Displacement'])
-            links.new(node_mapping.outputs['Vector'], node_imTexDisplacement.inputs['Vector'])
-            shaderSetup.setMapping(node_imTexDisplacement)
+                links.new(node_imTex.outputs['Color'], node_principled.inputs[shaderInput])
+            links.new(node_mapping.outputs['Vector'], node_imTex.inputs['Vector'])
+            shaderSetup.setMapping(node_imTex, mapping)
             imported_tex_nodes += 1
+    
+    # Picks the files of a texture set that simplePrincipledSetup will use, as {texture type: (file, loaded as Non-Color)}
+    def selectedTextures(tool, files):
+        selected = selectTextureFiles(files, int(tool.target_resolution), tool.normal_map_convention)
+        textures = {}
+        for texType, nodeName, prop, nonColor, shaderInput in principledSlots:
+            if texType in selected and getattr(tool, prop):
+                textures[texType] = (selected[texType], nonColor)
+        return textures
+    
+    # images is the imageCache to load textures through, pass the same one for a whole batch import to share images between materials
+    # templates is the shaderTemplates to copy node trees from, without one the node tree is built from scratch
+    def simplePrincipledSetup(name, files, images=None, templates=None):
+        tool = bpy.context.scene.assetlibrarytools
+        if images == None:
+            images = imageCache()
         
+        # Pick one file per texture type and only load the ones that will be used
+        textures = {}
+        for texType, (file, nonColor) in shaderSetup.selectedTextures(tool, files).items():
+            textures[texType] = images.load(file, nonColor=nonColor)
+        slotTypes = tuple(texType for texType in textures)
+        
+        # Create the material from a template with the same texture slots and options, or from scratch
+        if templates != None:
+            mat = templates.get(slotTypes, tool.texture_mapping, tool.add_extranodes).copy()
+            mat.name = name
+        else:
+            mat = bpy.data.materials.new(name)
+            shaderSetup.buildPrincipledTree(mat, slotTypes, tool.texture_mapping, tool.add_extranodes)
+        
+        # Fill texture nodes
+        nodes = mat.node_tree.nodes
+        for texType, nodeName, prop, nonColor, shaderInput in principledSlots:
+            if texType in textures:
+                nodes[nodeName].image = textures[texType]
         return mat
 
 
+# Template materials for a batch import, one per combination of texture slots, mapping and utility nodes
+# Imported materials are copies of a template with their images filled in, so each node tree is only built once
+class shaderTemplates():
+    
+    def __init__(self):
+        self.templates = {}
+    
+    def get(self, slotTypes, mapping, extraNodes):
+        key = (slotTypes, mapping, extraNodes)
+        if key not in self.templates:
+            mat = bpy.data.materials.new(".ALT_template") # Names starting with . are hidden in the UI
+            shaderSetup.buildPrincipledTree(mat, slotTypes, mapping, extraNodes)
+            self.templates[key] = mat
+        return self.templates[key]
+    
+    # Deletes the template materials, call this when the import is finished
+    def remove(self):
+        for mat in self.templates.values():
+            bpy.data.materials.remove(mat)
+        self.templates = {}
+
+
+# Set of the names of all materials in the file, built once per import run
+# Checking whether a material exists is then a set lookup instead of a scan over bpy.data.materials
+# Only names are kept here, creating and deleting the materials is up to the caller
+class materialNameIndex():
+    
+    def __init__(self):
+        self.names = set(mat.name for mat in bpy.data.materials)
+    
+    def __contains__(self, name):
+        return name in self.names
+    
+    def add(self, name):
+        self.names.add(name)
+
+
+# Record of the texture sets imported into this .blend, kept in a hidden text datablock so it is saved with the file
+# Each set directory maps to the fingerprint of its files, a string of the import options used and the name of the material it became
+# Re-running the import with incremental import on only rebuilds materials whose fingerprint or options changed
+class importManifest():
+    
+    textName = ".ALT_import_manifest"
+    
+    def __init__(self):
+        text = bpy.data.texts.get(importManifest.textName)
+        self.sets = {}
+        if text != None:
+            try:
+                self.sets = json.loads(text.as_string())
+            except ValueError:
+                pass
+    
+    # The import options that change the material made from a texture set
+    def optionsKey(tool):
+        return json.dumps([tool.tex_ignore_filter, tool.target_resolution, tool.normal_map_convention, tool.texture_mapping, tool.add_extranodes,
+                           tool.use_fake_user, tool.use_real_displacement, tool.use_proxy_textures, tool.proxy_size] + [getattr(tool, slot[2]) for slot in principledSlots])
+    
+    def get(self, path):
+        return self.sets.get(os.path.normpath(path))
+    
+    def record(self, path, fingerprint, options, materialName):
+        self.sets[os.path.normpath(path)] = {'fingerprint': fingerprint, 'options': options, 'material': materialName}
+    
+    def save(self):
+        text = bpy.data.texts.get(importManifest.textName)
+        if text == None:
+            text = bpy.data.texts.new(importManifest.textName)
+        text.from_string(json.dumps(self.sets, indent=1))
+
+
+# Joins mesh objects into one new mesh object without bpy.ops (no selection, active object or context needed)
+# Their mesh data is copied in bulk with foreach_get/foreach_set, vertices are moved into the space of the first mesh object
+# Vertices, edges, faces, smooth shading, UV maps (matched by name), material slots and custom split normals (with auto smooth) are kept,
+# other layers such as vertex groups, shape keys and colour attributes are not
+# The joined object takes the name, transform and collections of the first mesh object, the joined objects are deleted
+# Returns the joined object, or None if there were no mesh objects
+def joinMeshObjects(objects):
+    objects = [obj for obj in objects if obj.type == 'MESH']
+    if not objects:
+        return None
+    first = objects[0]
+    toFirst = np.array(first.matrix_world.inverted())
+    uvNames = []
+    for obj in objects:
+        for layer in obj.data.uv_layers:
+            if layer.name not in uvNames:
+                uvNames.append(layer.name)
+    # Custom normals (as imported from FBX and glTF) and auto smooth only survive if the split normals of every object are carried over
+    keepNormals = any(obj.data.has_custom_normals or obj.data.use_auto_smooth for obj in objects)
+    materials = [] # Material slots of the joined mesh
+    materialIndex = {} # Material -> slot of the joined mesh
+    coords, edges, loops, loopEdges, normals, starts, totals, materialIndices, smooth = [], [], [], [], [], [], [], [], []
+    uvs = {name: [] for name in uvNames}
+    vertexOffset = 0
+    edgeOffset = 0
+    loopOffset = 0
+    for obj in objects:
+        me = obj.data
+        nVerts, nEdges, nLoops, nPolys = len(me.vertices), len(me.edges), len(me.loops), len(me.polygons)
+        co = np.empty(nVerts * 3, dtype=np.float32)
+        me.vertices.foreach_get('co', co)
+        m = toFirst @ np.array(obj.matrix_world)
+        coords.append(co.reshape(-1, 3) @ m[:3, :3].T + m[:3, 3])
+        e = np.empty(nEdges * 2, dtype=np.int32)
+        me.edges.foreach_get('vertices', e)
+        edges.append(e + vertexOffset)
+        l = np.empty(nLoops, dtype=np.int32)
+        me.loops.foreach_get('vertex_index', l)
+        le = np.empty(nLoops, dtype=np.int32)
+        me.loops.foreach_get('edge_index', le)
+        if keepNormals:
+            me.calc_normals_split()
+            n = np.empty(nLoops * 3, dtype=np.float32)
+            me.loops.foreach_get('normal', n)
+            n = n.reshape(-1, 3) @ np.linalg.inv(m[:3, :3]) # Normals transform by the inverse transpose
+            n /= np.maximum(np.linalg.norm(n, axis=1), 1e-12)[:, None]
+        polyStarts = np.empty(nPolys, dtype=np.int32)
+        me.polygons.foreach_get('loop_start', polyStarts)
+        polyTotals = np.empty(nPolys, dtype=np.int32)
+        me.polygons.foreach_get('loop_total', polyTotals)
+        polyMaterials = np.empty(nPolys, dtype=np.int32)
+        me.polygons.foreach_get('material_index', polyMaterials)
+        polySmooth = np.empty(nPolys, dtype=bool)
+        me.polygons.foreach_get('use_smooth', polySmooth)
+        # Map the material slots of the object to the slots of the joined mesh
+        slotMap = []
+        for slot in obj.material_slots:
+            if slot.material not in materialIndex:
+                materialIndex[slot.material] = len(materials)
+                materials.append(slot.material)
+            slotMap.append(materialIndex[slot.material])
+        if slotMap:
+            polyMaterials = np.array(slotMap, dtype=np.int32)[np.clip(polyMaterials, 0, len(slotMap) - 1)]
+        else:
+            polyMaterials[:] = 0
+        objUVs = {}
+        for name in uvNames:
+            uv = np.zeros(nLoops * 2, dtype=np.float32)
+            if name in me.uv_layers:
+                me.uv_layers[name].data.foreach_get('uv', uv)
+            objUVs[name] = uv.reshape(-1, 2)
+        # Mirrored objects get the winding of their faces reversed, so their normals still point outwards after joining
+        if np.linalg.det(m[:3, :3]) < 0 and nPolys > 0:
+            byStart = np.argsort(polyStarts)
+            polyOfLoop = np.repeat(byStart, polyTotals[byStart])
+            loopIndex = np.arange(nLoops)
+            order = 2 * polyStarts[polyOfLoop] + polyTotals[polyOfLoop] - 1 - loopIndex
+            # The edge of a loop runs to the next loop of its face, reversed that is the edge of the previous loop
+            previous = polyStarts[polyOfLoop] + (loopIndex - polyStarts[polyOfLoop] - 1) % polyTotals[polyOfLoop]
+            l = l[order]
+            le = le[previous[order]]
+            if keepNormals:
+                n = n[order]
+            objUVs = {name: uv[order] for name, uv in objUVs.items()}
+        loops.append(l + vertexOffset)
+        loopEdges.append(le + edgeOffset)
+        if keepNormals:
+            normals.append(n)
+        starts.append(polyStarts + loopOffset)
+        totals.append(polyTotals)
+        materialIndices.append(polyMaterials)
+        smooth.append(polySmooth)
+        for name in uvNames:
+            uvs[name].append(objUVs[name])
+        vertexOffset += nVerts
+        edgeOffset += nEdges
+        loopOffset += nLoops
+    
+    mesh = bpy.data.meshes.new(first.data.name)
+    co = np.concatenate(coords).astype(np.float32)
+    mesh.vertices.add(len(co))
+    mesh.vertices.foreach_set('co', co.ravel())
+    e = np.concatenate(edges)
+    mesh.edges.add(len(e) // 2)
+    mesh.edges.foreach_set('vertices', e)
+    l = np.concatenate(loops)
+    mesh.loops.add(len(l))
+    mesh.loops.foreach_set('vertex_index', l)
+    mesh.loops.foreach_set('edge_index', np.concatenate(loopEdges))
+    polyStarts = np.concatenate(starts)
+    mesh.polygons.add(len(polyStarts))
+    mesh.polygons.foreach_set('loop_start', polyStarts)
+    if not mesh.polygons.bl_rna.properties['loop_total'].is_readonly: # Worked out from loop_start since blender 3.6
+        mesh.polygons.foreach_set('loop_total', np.concatenate(totals))
+    mesh.polygons.foreach_set('material_index', np.concatenate(materialIndices))
+    mesh.polygons.foreach_set('use_smooth', np.concatenate(smooth))
+    for name in uvNames:
+        layer = mesh.uv_layers.new(name=name)
+        if layer != None: # Meshes have at most 8 UV maps
+            layer.data.foreach_set('uv', np.concatenate(uvs[name]).ravel())
+    for mat in materials:
+        mesh.materials.append(mat)
+    mesh.update()
+    if keepNormals:
+        mesh.use_auto_smooth = True
+        for obj in objects:
+            if obj.data.use_auto_smooth:
+                mesh.auto_smooth_angle = obj.data.auto_smooth_angle
+                break
+        mesh.normals_split_custom_set(np.concatenate(normals))
+    
+    name = first.name
+    joined = bpy.data.objects.new(name, mesh)
+    for coll in first.users_collection:
+        coll.objects.link(joined)
+    joined.matrix_world = first.matrix_world
+    joinedSet = set(objects)
+    for obj in objects:
+        # Children that werent joined keep their place in the world
+        for child in obj.children:
+            if child not in joinedSet:
+                matrix = child.matrix_world.copy()
+                child.parent = None
+                child.matrix_world = matrix
+        oldMesh = obj.data
+        bpy.data.objects.remove(obj)
+        if oldMesh.users == 0:
+            bpy.data.meshes.remove(oldMesh)
+    joined.name = name
+    return joined
+
+
+# Model formats OT_ImportModels imports: file extension -> (tool property that turns the format on, format name, importer)
+# Adding a format only needs an entry here and its tool property
+modelImporters = {
+    '.fbx': ("import_fbx", "FBX", lambda path: bpy.ops.import_scene.fbx(filepath=path)),
+    '.gltf': ("import_gltf", "GLTF", lambda path: bpy.ops.import_scene.gltf(filepath=path)),
+    '.glb': ("import_gltf", "GLB", lambda path: bpy.ops.import_scene.gltf(filepath=path)),
+    '.obj': ("import_obj", "OBJ", lambda path: bpy.ops.import_scene.obj(filepath=path)),
+    '.x3d': ("import_x3d", "X3D", lambda path: bpy.ops.import_scene.x3d(filepath=path)),
+    '.stl': ("import_stl", "STL", lambda path: bpy.ops.import_mesh.stl(filepath=path)),
+    '.ply': ("import_ply", "PLY", lambda path: bpy.ops.import_mesh.ply(filepath=path)),
+}
+
+
+# The conversion cache model imports go through, or None if it is turned off
+# Entries are keyed by the content of the model file, its format and the blender version, since importers change between versions
+def modelConversionCache(tool):
+    if tool.use_model_cache != True:
+        return None
+    directory = bpy.path.abspath(tool.model_cache_path) if tool.model_cache_path != "" else bpy.utils.user_resource('DATAFILES', path="AssetLibraryTools_models", create=True)
+    return ModelCache(directory, tool.model_cache_size * 1024 * 1024, bpy.app.version_string)
+
+
+# The values of the tool properties, for passing them to background workers
+def toolSettings(tool):
+    settings = {}
+    for name in properties.__annotations__:
+        value = getattr(tool, name)
+        if isinstance(value, (bool, int, float, str)):
+            settings[name] = value
+    return settings
+
+
+# Runs the shards of a batch job in background blender processes (ALT_BackgroundWorker.py), at most (workers) of them at once
+# Each worker saves what it made to a .blend file in (directory), or a temporary directory that is deleted by stop() if directory is empty
+class backgroundWorkers():
+    
+    script = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'ALT_BackgroundWorker.py')
+    
+    def __init__(self, kind, tool, shards, workers, directory=""):
+        self.kind = kind
+        self.settings = toolSettings(tool)
+        self.shards = shards
+        self.workers = max(1, workers)
+        self.keep = directory != ""
+        self.directory = bpy.path.abspath(directory) if self.keep else tempfile.mkdtemp(prefix='ALT_{0}_'.format(kind))
+        os.makedirs(self.directory, exist_ok=True)
+        self.processes = {} # Shard index -> worker process
+        self.next = 0 # Index of the next shard to start
+    
+    def output(self, i):
+        return os.path.join(self.directory, "{0}_shard{1:04d}.blend".format(self.kind, i))
+    
+    # Starts workers for the next shards until (workers) are running
+    def startMore(self):
+        running = sum(1 for p in self.processes.values() if p.poll() == None)
+        while self.next < len(self.shards) and running < self.workers:
+            jobPath = self.output(self.next) + '.job.json'
+            if os.path.exists(self.output(self.next) + '.json'): # Left over from an earlier run in the same directory
+                os.remove(self.output(self.next) + '.json')
+            with open(jobPath, 'w') as f:
+                json.dump({'kind': self.kind, 'addonDir': os.path.dirname(backgroundWorkers.script), 'tool': self.settings, 'items': self.shards[self.next], 'output': self.output(self.next)}, f)
+            self.processes[self.next] = subprocess.Popen([bpy.app.binary_path, '-b', '--factory-startup', '--python-exit-code', '1', '--python', backgroundWorkers.script, '--', jobPath])
+            self.next += 1
+            running += 1
+    
+    # Returns the result of shard i, or None if its worker hasnt finished yet
+    # The result is the dict the worker saved, with 'blend' set to the path of its .blend file. Raises RuntimeError if the worker failed
+    def result(self, i):
+        self.startMore()
+        if i not in self.processes or self.processes[i].poll() == None:
+            return None
+        output = self.output(i)
+        if self.processes[i].returncode != 0 or not os.path.isfile(output + '.json'):
+            raise RuntimeError("Background worker for shard {0} failed, see the system console".format(i))
+        with open(output + '.json') as f:
+            result = json.load(f)
+        for leftover in [output + '.json', output + '.job.json']:
+            os.remove(leftover)
+        result['blend'] = output
+        return result
+    
+    def stop(self):
+        for p in self.processes.values():
+            if p.poll() == None:
+                p.terminate()
+                p.wait()
+        if not self.keep:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
 # This code is bad!!!!
 # But i dont want to fix it!!!!
 def listDownloadAttribs(scene, context):
@@ -281,6 +571,45 @@ class properties(PropertyGroup):
         default = "",
         maxlen = 1024,
         )
+    incremental_import : BoolProperty(
+        name = "Incremental import",
+        description = "Remember the files of each imported texture set in this .blend file.\nOn the next import only texture sets whose files or import options changed are imported again, their materials are replaced",
+        default = False
+        )
+    pbr_import_workers : IntProperty(
+        name = "Worker processes",
+        description = "Number of background blender processes the texture sets are split between, 1 imports in this blender.\nWorkers build the materials in parallel and they are appended into this file when each worker finishes",
+        default = 1,
+        min = 1,
+        max = 64
+        )
+    shard_library_path : StringProperty(
+        name = "Worker library directory",
+        description = "Directory the .blend file made by each worker is kept in, these can be used as libraries.\nLeave empty to use a temporary directory that is deleted after import",
+        default = "",
+        maxlen = 1024,
+        subtype = 'DIR_PATH'
+        )
+    use_proxy_textures : BoolProperty(
+        name = "Use proxy textures",
+        description = "Build materials with downscaled copies of the textures, for light previews and viewport shading.\nProxies are made by background blender processes (Worker processes of them) and cached on disk.\nUse 'Swap proxy / full resolution textures' under Utilities to render with the full resolution textures",
+        default = False
+        )
+    proxy_size : EnumProperty(
+        name = "Proxy size",
+        description = "Largest side of the proxy textures in pixels, smaller textures are copied as they are",
+        items = [('512', "512", ""),
+                 ('1024', "1K", ""),
+                 ('2048', "2K", "")],
+        default = '1024'
+        )
+    proxy_cache_path : StringProperty(
+        name = "Proxy cache directory",
+        description = "Directory proxy textures are cached in. Leave empty to use a directory in the blender user data directory",
+        default = "",
+        maxlen = 1024,
+        subtype = 'DIR_PATH'
+        )
     use_fake_user : BoolProperty(
         name = "Use fake user",
         description = "Use fake user on imported materials",
@@ -296,6 +625,23 @@ class properties(PropertyGroup):
         description = "Adds nodes to the imported materials for easy control",
         default = False
         )
+    target_resolution : EnumProperty(
+        name="Resolution",
+        description="When a texture set has the same texture in several resolutions, use the one closest to this",
+        items=[ ('0', "Highest available", ""),
+                ('1024', "1K", ""),
+                ('2048', "2K", ""),
+                ('4096', "4K", ""),
+                ('8192', "8K", ""),
+               ]
+        )
+    normal_map_convention : EnumProperty(
+        name="Normal maps",
+        description="When a texture set has both DirectX and OpenGL normal maps, use this one",
+        items=[ ('GL', "OpenGL", "Blender uses OpenGL normal maps"),
+                ('DX', "DirectX", ""),
+               ]
+        )
     texture_mapping : EnumProperty(
         name='Mapping',
         default='UV',
@@ -377,7 +723,7 @@ class properties(PropertyGroup):
         default = True
         )
     import_gltf : BoolProperty(
-        name = "Import GLTF files",
+        name = "Import GLTF/GLB files",
         description = "",
         default = True
         )
@@ -391,6 +737,41 @@ class properties(PropertyGroup):
         description = "",
         default = True
         )
+    model_import_workers : IntProperty(
+        name = "Worker processes",
+        description = "Number of background blender processes the model files are split between, 1 imports in this blender.\nWorkers import, move and join in parallel and their results are appended into this file when each worker finishes",
+        default = 1,
+        min = 1,
+        max = 64
+        )
+    use_model_cache : BoolProperty(
+        name = "Use conversion cache",
+        description = "Keep the result of importing each model file as a .blend in a cache directory.\nImporting a file whose contents havent changed is then a fast library load instead of a new import",
+        default = False
+        )
+    model_cache_path : StringProperty(
+        name = "Cache directory",
+        description = "Directory converted models are cached in. Leave empty to use a directory in the blender user data directory",
+        default = "",
+        maxlen = 1024,
+        subtype = 'DIR_PATH'
+        )
+    model_cache_size : IntProperty(
+        name = "Cache size limit (MB)",
+        description = "The least recently used cached models are deleted after an import when the cache is bigger than this",
+        default = 10240,
+        min = 1
+        )
+    import_stl : BoolProperty(
+        name = "Import STL files",
+        description = "",
+        default = True
+        )
+    import_ply : BoolProperty(
+        name = "Import PLY files",
+        description = "",
+        default = True
+        )
         
         
     # Batch append properties
@@ -543,6 +924,40 @@ class properties(PropertyGroup):
         description = "",
         default = True
         )
+    downloadWorkers : IntProperty(
+        name = "Parallel downloads",
+        description = "Number of assets to download at the same time.\nConnections are kept alive and shared between downloads",
+        default = 4,
+        min = 1,
+        max = 32
+        )
+    unzipWorkers : IntProperty(
+        name = "Parallel unzips",
+        description = "Number of zip files to extract at the same time, extraction runs alongside the downloads",
+        default = 2,
+        min = 1,
+        max = 32
+        )
+    downloadRateLimit : FloatProperty(
+        name = "Max download rate (MB/s)",
+        description = "Combined download rate limit of all parallel downloads in megabytes per second.\n0 = unlimited",
+        default = 0,
+        min = 0
+        )
+    downloadOrder : EnumProperty(
+        name="Download order",
+        description="Choose the order to download assets in",
+        items=[ ('name', "Name", "Download assets sorted by name"),
+                ('smallest', "Smallest first", "Download small assets first, so the first results arrive quickly"),
+                ('largest', "Largest first", "Download large assets first, keeps the connections busy for the longest time"),
+               ]
+        )
+    catalogMaxAge : IntProperty(
+        name = "Asset data max age (minutes)",
+        description = "Use the cached asset data csv without checking ambientcg.com for changes if it is younger than this.\n0 always checks for changes (unchanged data is not downloaded again)",
+        default = 0,
+        min = 0
+        )
     terminal : EnumProperty(
         name="Terminal",
         description="Choose terminal to run script with",
@@ -550,6 +965,7 @@ class properties(PropertyGroup):
                 ('gnome-terminal', "gnome-terminal", ""),
                 ('konsole', 'konsole', ""),
                 ('xterm', 'xterm', ""),
+                ('background', "None (run in background)", "Run without a terminal, progress is shown in the status bar"), # Last, files store the index of the chosen item
                ]
         )
     
@@ -620,218 +1036,540 @@ class properties(PropertyGroup):
 #    Operators
 # ------------------------------------------------------------------------
 
-class OT_BatchImportPBR(Operator):
+# Base for operators that work through a list of items (texture sets, model files, .blend files)
+# Run from the UI (invoke) the items are processed on a timer, a bounded slice of time per tick, so blender stays responsive,
+# the progress is shown in the status bar and Esc cancels after the current item. execute() still runs everything at once for scripts
+# Subclasses implement:
+#  prepareJob(context) -> list of items
+#  processItem(context, item), which can return False if the item isnt ready yet (waiting for a background worker) to be called again later
+#  finishJob(context, cancelled) -> summary message
+# and can implement cleanupJob(context), which runs however the job ends (also when prepareJob or processItem raise) to free what the job holds
+class batchJob():
+    
+    jobName = "Working"
+    timeSlice = 0.1 # Seconds of work per timer tick
+    
+    def execute(self, context):
+        try:
+            for item in self.prepareJob(context):
+                while self.processItem(context, item) == False:
+                    time.sleep(0.1)
+        finally:
+            self.cleanupJob(context)
+        DisplayMessageBox(self.finishJob(context, False))
+        return {'FINISHED'}
+    
+    def invoke(self, context, event):
+        try:
+            self.items = self.prepareJob(context)
+        except:
+            self.cleanupJob(context)
+            raise
+        self.processed = 0
+        self.startTime = time.perf_counter()
+        wm = context.window_manager
+        self.timer = wm.event_timer_add(0.01, window=context.window)
+        wm.progress_begin(0, max(1, len(self.items)))
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.endJob(context)
+            DisplayMessageBox("Cancelled after {0} of {1} items. ".format(self.processed, len(self.items)) + self.finishJob(context, True))
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        try:
+            sliceEnd = time.perf_counter() + self.timeSlice
+            while self.processed < len(self.items) and time.perf_counter() < sliceEnd:
+                if self.processItem(context, self.items[self.processed]) == False:
+                    break
+                self.processed += 1
+        except:
+            self.endJob(context)
+            raise
+        if self.processed >= len(self.items):
+            self.endJob(context)
+            DisplayMessageBox(self.finishJob(context, False))
+            return {'FINISHED'}
+        context.window_manager.progress_update(self.processed)
+        rate = self.processed / max(time.perf_counter() - self.startTime, 1e-6)
+        eta = "{0:.0f}s".format((len(self.items) - self.processed) / rate) if rate > 0 else "?"
+        context.workspace.status_text_set("{0}: {1}/{2}, {3:.1f} items/s, ETA {4} (Esc to cancel)".format(self.jobName, self.processed, len(self.items), rate, eta))
+        return {'RUNNING_MODAL'}
+    
+    def endJob(self, context):
+        try:
+            wm = context.window_manager
+            wm.event_timer_remove(self.timer)
+            wm.progress_end()
+            context.workspace.status_text_set(None)
+        finally:
+            self.cleanupJob(context)
+    
+    def cleanupJob(self, context):
+        pass
+
+
+class OT_BatchImportPBR(batchJob, Operator):
     bl_label = "Import PBR textures"
     bl_idname = "alt.batchimportpbr"
-    def execute(self, context):
-        scene = context.scene
-        tool = scene.assetlibrarytools
-        n_imp = 0 # Number of materials imported
-        n_del = 0 # Number of materials deleted (due to no textures after import)
-        n_skp = 0 # Number of materials skipped due to them already existing
-        existing_mat_names = []
-        subdirectories = [x for x in pathlib.Path(tool.mat_import_path).iterdir() if x.is_dir()] # Get subdirs in directory selected in UI
-        for sd in subdirectories:
-            filePaths = [x for x in pathlib.Path(sd).iterdir() if x.is_file()] # Get filepaths of textures
-            if tool.tex_ignore_filter != "": # Remove filepaths of textures which contain a filtered string, if a filter is chosen.
-                for fp in filePaths:
-                    if tool.tex_ignore_filter in fp.name:
-                        filePaths.pop(filePaths.index(fp))
-            # Get existing material names if skipping existing materials is turned on
-            if tool.skip_existing == True:
-                existing_mat_names = []
-                for mat in bpy.data.materials:
-                    existing_mat_names.append(mat.name)
-            # check if the material thats about to be imported exists or not, or if we dont care about skipping existing materials.
-            if (sd.name not in existing_mat_names) or (tool.skip_existing != True):
-                mat = shaderSetup.simplePrincipledSetup(sd.name, filePaths) # Create shader using filepaths of textures
-                if tool.use_fake_user == True: # Enable fake user (if desired)
-                    mat.use_fake_user = True
-                if tool.use_real_displacement == True: # Enable real displacement (if desired)
-                    mat.cycles.displacement_method = 'BOTH'
-                # Delete the material if it contains no textures
-                hasTex = False
-                for n in mat.node_tree.nodes: 
-                    if n.type == 'TEX_IMAGE': # Check if shader contains textures, if yes, then its worth keeping
-                        hasTex = True
-                if hasTex == False:
-                    bpy.data.materials.remove(mat) # Delete material if it contains no textures
-                    n_del += 1
-                else:
-                    n_imp += 1
-            else:
-                n_skp += 1
-        if (n_del > 0) and (n_skp > 0):
-            DisplayMessageBox("Complete, {0} materials imported, {1} were deleted after import because they contained no textures (No recognised textures were found in the folder), {2} skipped because they already exist".format(n_imp,n_del,n_skp))
-        elif n_skp > 0:
-            DisplayMessageBox("Complete, {0} materials imported. {1} skipped because they already exist".format(n_imp, n_skp))
-        elif n_del > 0:
-            DisplayMessageBox("Complete, {0} materials imported, {1} were deleted after import because they contained no textures (No recognised textures were found in the folder)".format(n_imp,n_del))
+    jobName = "Importing PBR textures"
+    # What cleanupJob frees, set by prepareJob
+    templates = None
+    manifest = None
+    workers = None
+    proxyWorkers = None
+    
+    # The items of the job are tagged tuples:
+    #  ('proxy', i, shard) a shard of proxy textures made by a background worker, these come first
+    #  ('set', ts, oldMatName) a texture set to build a material for in this blender
+    #  ('chunk', i, chunk) a chunk of texture sets built by a background worker, with more than one worker
+    def prepareJob(self, context):
+        tool = context.scene.assetlibrarytools
+        self.n_imp = 0 # Number of materials imported
+        self.n_del = 0 # Number of materials deleted (due to no textures after import)
+        self.n_skp = 0 # Number of materials skipped due to them already existing
+        self.n_upd = 0 # Number of materials rebuilt because their textures or the import options changed
+        self.n_unc = 0 # Number of materials skipped because their textures didnt change since the last import
+        self.n_err = 0 # Number of materials not imported because a background worker failed
+        self.n_prx = 0 # Number of proxy textures that couldnt be made, the full resolution textures are used instead
+        self.existing_mat_names = materialNameIndex() # Names of existing materials, for skipping existing materials
+        self.proxies = {} # Resolved texture path -> proxy texture path
+        self.images = imageCache(self.proxies) # Images loaded during this import, shared between materials
+        self.templates = shaderTemplates() # Node trees the materials are copied from
+        self.manifest = importManifest() if tool.incremental_import else None
+        self.options = importManifest.optionsKey(tool)
+        self.workers = None
+        self.proxyWorkers = None
+        texSets = scanTextureSets(tool.mat_import_path, tool.tex_ignore_filter, fingerprints=tool.incremental_import) # Get subdirs in directory selected in UI and the filepaths of the textures in them (minus filtered ones)
+        build = []
+        for ts in texSets:
+            needed, oldMatName = self.planSet(tool, ts)
+            if needed:
+                build.append((ts, oldMatName))
+        items = []
+        if tool.use_proxy_textures:
+            items += self.prepareProxies(tool, build)
+        if tool.pbr_import_workers <= 1:
+            return items + [('set', ts, oldMatName) for ts, oldMatName in build]
+        # A few chunks per worker, so a slow chunk doesnt leave the other workers idle at the end
+        chunkSize = max(1, min(50, -(-len(build) // (tool.pbr_import_workers * 4))))
+        chunks = [build[i:i+chunkSize] for i in range(0, len(build), chunkSize)]
+        shards = [[[ts.name, ts.path, [str(f) for f in ts.files], self.setProxies(tool, ts)] for ts, oldMatName in chunk] for chunk in chunks]
+        self.workers = backgroundWorkers('pbr', tool, shards, tool.pbr_import_workers, tool.shard_library_path)
+        return items + [('chunk', i, chunk) for i, chunk in enumerate(chunks)]
+    
+    # Finds the proxies of the textures the materials will use, the ones that arent in the proxy cache yet are made by background workers
+    def prepareProxies(self, tool, build):
+        cacheDir = bpy.path.abspath(tool.proxy_cache_path) if tool.proxy_cache_path != "" else bpy.utils.user_resource('DATAFILES', path="AssetLibraryTools_proxies", create=True)
+        size = int(tool.proxy_size)
+        missing = []
+        for ts, oldMatName in build:
+            for file, nonColor in shaderSetup.selectedTextures(tool, ts.files).values():
+                source = str(pathlib.Path(file).resolve())
+                if source not in self.proxies:
+                    self.proxies[source] = proxyPath(cacheDir, source, size)
+                    if not os.path.isfile(self.proxies[source]):
+                        missing.append([source, self.proxies[source], size])
+        shards = [missing[i:i+20] for i in range(0, len(missing), 20)]
+        self.proxyWorkers = backgroundWorkers('proxy', tool, shards, tool.pbr_import_workers)
+        return [('proxy', i, shard) for i, shard in enumerate(shards)]
+    
+    # Decides whether a material has to be built for a texture set, counting the set as skipped or unchanged if not
+    # Returns (needed, oldMatName), oldMatName is the material the new one replaces (a changed set with incremental import) or None
+    def planSet(self, tool, ts):
+        # With incremental import, sets imported before are skipped if nothing changed and rebuilt otherwise
+        oldMatName = None
+        if self.manifest != None:
+            entry = self.manifest.get(ts.path)
+            if entry != None and (entry['material'] == None or entry['material'] in self.existing_mat_names):
+                if entry['fingerprint'] == ts.fingerprint and entry['options'] == self.options:
+                    self.n_unc += 1
+                    return (False, None)
+                oldMatName = entry['material']
+        # check if the material thats about to be imported exists or not, or if we dont care about skipping existing materials.
+        if oldMatName != None or (ts.name not in self.existing_mat_names) or (tool.skip_existing != True):
+            # Every set is planned before any material is built, so a later set with the same name counts this one as existing
+            self.existing_mat_names.add(ts.name)
+            return (True, oldMatName)
+        self.n_skp += 1
+        return (False, None)
+    
+    # Makes the material for a texture set, returns None if it contains no textures (No recognised textures were found in the folder)
+    # Also used by the background workers
+    def buildMaterial(tool, ts, images, templates):
+        mat = shaderSetup.simplePrincipledSetup(ts.name, ts.files, images, templates) # Create shader using filepaths of textures
+        if tool.use_fake_user == True: # Enable fake user (if desired)
+            mat.use_fake_user = True
+        if tool.use_real_displacement == True: # Enable real displacement (if desired)
+            mat.cycles.displacement_method = 'BOTH'
+        # Delete the material if it contains no textures
+        hasTex = False
+        for n in mat.node_tree.nodes: 
+            if n.type == 'TEX_IMAGE': # Check if shader contains textures, if yes, then its worth keeping
+                hasTex = True
+        if hasTex == False:
+            bpy.data.materials.remove(mat)
+            return None
+        return mat
+    
+    # Counts the material built for a texture set (None if it was deleted) and puts it in place of the material it replaces
+    def addMaterial(self, ts, mat, oldMatName):
+        if mat == None:
+            self.n_del += 1
         else:
-            DisplayMessageBox("Complete, {0} materials imported".format(n_imp))
-        return{'FINISHED'}
+            oldMat = bpy.data.materials.get(oldMatName) if oldMatName != None else None
+            if oldMat != None:
+                # Replace the old material everywhere it is used, then give the new one its name
+                oldMat.user_remap(mat)
+                bpy.data.materials.remove(oldMat)
+                mat.name = oldMatName
+                self.n_upd += 1
+            else:
+                self.n_imp += 1
+        if self.manifest != None:
+            self.manifest.record(ts.path, ts.fingerprint, self.options, mat.name if mat != None else None)
+    
+    # The proxies of the textures of one texture set, for the background worker building it
+    def setProxies(self, tool, ts):
+        proxies = {}
+        if self.proxies:
+            for file, nonColor in shaderSetup.selectedTextures(tool, ts.files).values():
+                source = str(pathlib.Path(file).resolve())
+                if source in self.proxies:
+                    proxies[source] = self.proxies[source]
+        return proxies
+    
+    def processItem(self, context, item):
+        tool = context.scene.assetlibrarytools
+        if item[0] == 'set':
+            kind, ts, oldMatName = item
+            self.addMaterial(ts, OT_BatchImportPBR.buildMaterial(tool, ts, self.images, self.templates), oldMatName)
+            return True
+        if item[0] == 'proxy':
+            kind, i, shard = item
+            try:
+                result = self.proxyWorkers.result(i)
+            except RuntimeError as e:
+                print(e)
+                self.n_prx += len(shard)
+                return True
+            if result == None:
+                return False
+            self.n_prx += len(result['failed'])
+            return True
+        # A chunk built by a background worker, append its materials once it is done
+        kind, i, chunk = item
+        try:
+            result = self.workers.result(i)
+        except RuntimeError as e:
+            print(e)
+            self.n_err += len(chunk)
+            return True
+        if result == None:
+            return False
+        names = [result['materials'][ts.path] for ts, oldMatName in chunk if result['materials'][ts.path] != None]
+        with bpy.data.libraries.load(result['blend'], link=False) as (data_from, data_to):
+            data_to.materials = names
+        appended = dict(zip(names, data_to.materials)) # Appended materials are renamed if their name is already taken
+        # Each worker .blend brings its own copy of a texture shared with sets in other chunks, keep one image per texture
+        for mat in appended.values():
+            if mat == None:
+                continue
+            for node in mat.node_tree.nodes:
+                if node.type == 'TEX_IMAGE' and node.image != None:
+                    image = self.images.adopt(node.image)
+                    if image != node.image:
+                        duplicate = node.image
+                        duplicate.user_remap(image)
+                        bpy.data.images.remove(duplicate)
+        for ts, oldMatName in chunk:
+            mat = appended.get(result['materials'][ts.path])
+            if mat != None:
+                mat.use_fake_user = tool.use_fake_user # Workers save their materials with a fake user
+            self.addMaterial(ts, mat, oldMatName)
+        return True
+    
+    # Removes the template materials, stops the background workers and saves what was imported to the manifest
+    def cleanupJob(self, context):
+        if self.templates != None:
+            self.templates.remove()
+            self.templates = None
+        if self.proxyWorkers != None:
+            self.proxyWorkers.stop()
+            self.proxyWorkers = None
+        if self.workers != None:
+            self.workers.stop()
+            self.workers = None
+        if self.manifest != None:
+            self.manifest.save()
+            self.manifest = None
+    
+    def finishJob(self, context, cancelled):
+        message = "{0} materials imported".format(self.n_imp)
+        if not cancelled:
+            message = "Complete, " + message
+        if self.n_upd > 0:
+            message += ", {0} updated because their textures or import options changed".format(self.n_upd)
+        if self.n_unc > 0:
+            message += ", {0} unchanged since the last import".format(self.n_unc)
+        if self.n_del > 0:
+            message += ", {0} were deleted after import because they contained no textures (No recognised textures were found in the folder)".format(self.n_del)
+        if self.n_skp > 0:
+            message += ", {0} skipped because they already exist".format(self.n_skp)
+        if self.n_err > 0:
+            message += ", {0} failed in a background worker (see the system console)".format(self.n_err)
+        if self.n_prx > 0:
+            message += ". {0} proxy textures couldnt be made, their full resolution textures are used".format(self.n_prx)
+        return message
 
 
-class OT_ImportModels(Operator):
+class OT_ImportModels(batchJob, Operator):
     bl_label = "Import models"
     bl_idname = "alt.importmodels"
+    jobName = "Importing models"
+    # What cleanupJob frees, set by prepareJob
+    workers = None
+    cache = None
+    
+    # Each file is imported into a new collection, set as the active collection since importers link new objects to it
+    # Its objects are then exactly the new objects, finding them costs as much as the file has objects, no matter how big the scene already is
+    def newImportCollection(context, collName):
+        newCollection = bpy.data.collections.new(collName)
+        context.scene.collection.children.link(newCollection)
+        context.view_layer.active_layer_collection = context.view_layer.layer_collection.children[newCollection.name]
+        return newCollection
     
-    # Hide new objects works by comparing a list of objects before (x) happened with the current list via bpy.context.scene.objects to get the list of new objects, then hides those new objects
-    def hideNewObjects(old_objects):
+    def hideNewObjects(new_objects):
         scene = bpy.context.scene
         tool = scene.assetlibrarytools
         if tool.hide_after_import == True:
-            imported_objects = set(bpy.context.scene.objects) - old_objects
-            for object in imported_objects:
+            for object in new_objects:
                 object.hide_set(True)
     
-    def moveNewObjectsToNewCollection(old_objects, collName):
+    # Keeps the collection a file was imported into, or moves its contents to the collection that was active before and removes it
+    def moveNewObjectsToNewCollection(newCollection, target):
         scene = bpy.context.scene
         tool = scene.assetlibrarytools
-        if tool.move_to_new_collection_after_import == True: 
-            imported_objects = set(bpy.context.scene.objects) - old_objects
-            newCollection = bpy.data.collections.new(collName)
-            bpy.context.scene.collection.children.link(newCollection)
-            for obj in imported_objects:
-                for uc in obj.users_collection:
-                    uc.objects.unlink(obj)
-                newCollection.objects.link(obj)
-    
-    def joinAllNewObjects(old_objects):
+        if tool.move_to_new_collection_after_import != True:
+            for obj in newCollection.objects:
+                target.objects.link(obj)
+            for child in newCollection.children:
+                target.children.link(child)
+            bpy.data.collections.remove(newCollection)
+    
+    # Joins the new mesh objects into one, returns the objects left after joining
+    def joinAllNewObjects(new_objects):
         scene = bpy.context.scene
         tool = scene.assetlibrarytools
         if tool.join_new_objects == True:
-            imported_objects = set(bpy.context.scene.objects) - old_objects
-            bpy.ops.object.select_all(action='DESELECT')
-            for obj in imported_objects:
-                bpy.context.view_layer.objects.active = obj
-                obj.select_set(True)
-            bpy.ops.object.join()
+            others = [obj for obj in new_objects if obj.type != 'MESH']
+            joined = joinMeshObjects(new_objects)
+            if joined != None:
+                return [joined] + others
+        return new_objects
     
-    def execute(self, context):
-        scene = context.scene
-        tool = scene.assetlibrarytools
-        p = pathlib.Path(str(tool.model_import_path))
-        imported = 0 # Number of imported objects
-        errors = 0 # Number of import errors
-        # Import FBX files
-        if tool.import_fbx == True:
-            fbxFilePaths = [x for x in p.glob('**/*.fbx') if x.is_file()] # Get filepaths of files with the extension .fbx in the selected directory (and subdirs, recursively)
-            for filePath in fbxFilePaths:
-                old_objects = set(context.scene.objects)
-                try:
-                    bpy.ops.import_scene.fbx(filepath=str(filePath))
-                    imported += 1
-                except:
-                    print("FBX import error")
-                    errors += 1
-                OT_ImportModels.hideNewObjects(old_objects)
-                OT_ImportModels.moveNewObjectsToNewCollection(old_objects, filePath.name)
-                OT_ImportModels.joinAllNewObjects(old_objects)
-        # Import GLTF files
-        if tool.import_gltf == True:
-            gltfFilePaths = [x for x in p.glob('**/*.gltf') if x.is_file()] # Get filepaths of files with the extension .gltf in the selected directory (and subdirs, recursively)
-            for filePath in gltfFilePaths:
-                old_objects = set(context.scene.objects)
-                try:
-                    bpy.ops.import_scene.gltf(filepath=str(filePath))
-                    imported += 1
-                except:
-                    print("GLTF import error")
-                    errors += 1
-                OT_ImportModels.hideNewObjects(old_objects)
-                OT_ImportModels.moveNewObjectsToNewCollection(old_objects, filePath.name)
-                OT_ImportModels.joinAllNewObjects(old_objects)
-        # Import OBJ files
-        if tool.import_obj == True:
-            objFilePaths = [x for x in p.glob('**/*.obj') if x.is_file()] # Get filepaths of files with the extension .obj in the selected directory (and subdirs, recursively)
-            for filePath in objFilePaths:
-                old_objects = set(context.scene.objects)
-                try:
-                    bpy.ops.import_scene.obj(filepath=str(filePath))
-                    imported += 1
-                except:
-                    print("OBJ import error")
-                    errors += 1
-                OT_ImportModels.hideNewObjects(old_objects)
-                OT_ImportModels.moveNewObjectsToNewCollection(old_objects, filePath.name)
-                OT_ImportModels.joinAllNewObjects(old_objects)
-        # Import X3D files
-        if tool.import_x3d == True:
-            x3dFilePaths = [x for x in p.glob('**/*.x3d') if x.is_file()] # Get filepaths of files with the extension .x3d in the selected directory (and subdirs, recursively)
-            for filePath in x3dFilePaths:
-                old_objects = set(context.scene.objects)
+    # Loads the collection a model file was cached as (see storeInCache) and links it to the scene in place of a new import collection
+    def loadFromCache(context, cachePath, collName):
+        with bpy.data.libraries.load(cachePath, link=False) as (data_from, data_to):
+            data_to.collections = data_from.collections
+        for coll in data_to.collections:
+            if coll != None and coll.get('ALT_cache_root'):
+                del coll['ALT_cache_root']
+                coll.use_fake_user = False
+                coll.name = collName
+                context.scene.collection.children.link(coll)
+                return coll
+        raise RuntimeError("No collection in " + cachePath)
+    
+    def storeInCache(cache, key, newCollection):
+        newCollection['ALT_cache_root'] = True
+        try:
+            bpy.data.libraries.write(cache.partPath(key), {newCollection}, fake_user=True, path_remap='ABSOLUTE')
+            cache.commit(key)
+        except (OSError, RuntimeError) as e:
+            print("Could not cache {0}: {1}".format(newCollection.name, e))
+        finally:
+            del newCollection['ALT_cache_root']
+    
+    # Imports one model file and applies the move, join and hide options to what it created, returns False if the importer failed
+    # With a conversion cache (modelConversionCache), unchanged files are loaded from the cache and new imports are added to it
+    # Also used by the background workers
+    def importModelFile(context, filePath, ext, cache=None):
+        prop, formatName, importer = modelImporters[ext]
+        target = context.view_layer.active_layer_collection
+        ok = True
+        newCollection = None
+        key = cache.key(str(filePath), formatName) if cache != None else None # None if the file cant be cached
+        if key != None:
+            cachePath = cache.lookup(key)
+            if cachePath != None:
                 try:
-                    bpy.ops.import_scene.x3d(filepath=str(filePath))
-                    imported += 1
-                except:
-                    print("X3D import error")
-                    errors += 1
-                OT_ImportModels.hideNewObjects(old_objects)
-                OT_ImportModels.moveNewObjectsToNewCollection(old_objects, filePath.name)
-                OT_ImportModels.joinAllNewObjects(old_objects)
-        if errors == 0:
-            DisplayMessageBox("Complete, {0} models imported".format(imported))
-        else:
-            DisplayMessageBox("Complete, {0} models imported. {1} import errors".format(imported, errors))
-        return{'FINISHED'}
+                    newCollection = OT_ImportModels.loadFromCache(context, cachePath, filePath.name)
+                except (OSError, RuntimeError) as e:
+                    print("Cache load error: {0}".format(e))
+        if newCollection == None:
+            newCollection = OT_ImportModels.newImportCollection(context, filePath.name)
+            try:
+                importer(str(filePath))
+            except:
+                print("{0} import error".format(formatName))
+                ok = False
+            finally:
+                context.view_layer.active_layer_collection = target
+            if ok and key != None:
+                OT_ImportModels.storeInCache(cache, key, newCollection)
+        new_objects = list(newCollection.all_objects)
+        OT_ImportModels.moveNewObjectsToNewCollection(newCollection, target.collection)
+        new_objects = OT_ImportModels.joinAllNewObjects(new_objects)
+        OT_ImportModels.hideNewObjects(new_objects)
+        return ok
+    
+    # Finds every file of the enabled formats in the selected directory (and subdirs, recursively)
+    # The directory tree is walked once for all formats, files are grouped by format in the order of modelImporters
+    # The items of the job are ('file', file path, extension), or with more than one worker ('chunk', i, [(file path, extension)]),
+    # a chunk of files imported by a background worker
+    def prepareJob(self, context):
+        tool = context.scene.assetlibrarytools
+        self.imported = 0 # Number of imported objects
+        self.errors = 0 # Number of import errors
+        self.cacheHits = 0 # Number of files loaded from the conversion cache by background workers
+        self.cache = modelConversionCache(tool)
+        self.workers = None
+        found = {ext: [] for ext in modelImporters if getattr(tool, modelImporters[ext][0])}
+        for dirPath, dirNames, fileNames in os.walk(str(tool.model_import_path)):
+            for fileName in fileNames:
+                ext = os.path.splitext(fileName)[1].lower()
+                if ext in found:
+                    found[ext].append(pathlib.Path(dirPath, fileName))
+        files = [(filePath, ext) for ext in found for filePath in sorted(found[ext])]
+        if tool.model_import_workers <= 1:
+            return [('file', filePath, ext) for filePath, ext in files]
+        # A few chunks per worker, so a slow chunk doesnt leave the other workers idle at the end
+        chunkSize = max(1, min(50, -(-len(files) // (tool.model_import_workers * 4))))
+        chunks = [files[i:i+chunkSize] for i in range(0, len(files), chunkSize)]
+        self.workers = backgroundWorkers('models', tool, [[[str(filePath), ext] for filePath, ext in chunk] for chunk in chunks], tool.model_import_workers, tool.shard_library_path)
+        return [('chunk', i, chunk) for i, chunk in enumerate(chunks)]
+    
+    def processItem(self, context, item):
+        if item[0] == 'file':
+            kind, filePath, ext = item
+            if OT_ImportModels.importModelFile(context, filePath, ext, self.cache):
+                self.imported += 1
+            else:
+                self.errors += 1
+            return True
+        # A chunk imported by a background worker, append its collections and objects once it is done
+        kind, i, chunk = item
+        try:
+            result = self.workers.result(i)
+        except RuntimeError as e:
+            print(e)
+            self.errors += len(chunk)
+            return True
+        if result == None:
+            return False
+        with bpy.data.libraries.load(result['blend'], link=False) as (data_from, data_to):
+            data_to.collections = result['collections']
+            data_to.objects = result['objects']
+        new_objects = []
+        for coll in data_to.collections:
+            if coll != None:
+                context.scene.collection.children.link(coll)
+                new_objects += coll.all_objects
+                coll.use_fake_user = False # Workers save with fake users
+        for obj in data_to.objects:
+            if obj != None:
+                context.view_layer.active_layer_collection.collection.objects.link(obj)
+                new_objects.append(obj)
+        for obj in new_objects:
+            obj.use_fake_user = False
+        OT_ImportModels.hideNewObjects(new_objects) # Hiding is a state of this view layer, it isnt saved with the objects
+        self.imported += result['imported']
+        self.errors += result['errors']
+        self.cacheHits += result['cacheHits']
+        return True
+    
+    # Stops the background workers and trims the conversion cache to its size limit
+    def cleanupJob(self, context):
+        if self.workers != None:
+            self.workers.stop()
+            self.workers = None
+        if self.cache != None:
+            self.cache.evict()
+    
+    def finishJob(self, context, cancelled):
+        message = "{0} models imported".format(self.imported)
+        if self.cache != None:
+            message += " ({0} from the conversion cache)".format(self.cache.hits + self.cacheHits)
+        if not cancelled:
+            message = "Complete, " + message
+        if self.errors > 0:
+            message += ". {0} import errors".format(self.errors)
+        return message
 
 
-class OT_BatchAppend(Operator):
+class OT_BatchAppend(batchJob, Operator):
     bl_label = "Append"
     bl_idname = "alt.batchappend"
-    def execute(self, context):
-        scene = context.scene
-        tool = scene.assetlibrarytools
+    jobName = "Appending"
+    
+    def prepareJob(self, context):
+        tool = context.scene.assetlibrarytools
         p = pathlib.Path(str(tool.append_path))
-        link = False # append, set to true to keep the link to the original file
         if tool.append_recursive_search == True:
-            blendFilePaths = [x for x in p.glob('**/*.blend') if x.is_file()] # Get filepaths of files with the extension .blend in the selected directory (and subdirs, recursively)
+            return [x for x in p.glob('**/*.blend') if x.is_file()] # Get filepaths of files with the extension .blend in the selected directory (and subdirs, recursively)
         else:
-            blendFilePaths = [x for x in p.glob('*.blend') if x.is_file()] # Get filepaths of files with the extension .blend in the selected directory    
-        for path in blendFilePaths:
-            if tool.appendType == 'objects':
-                # link all objects
-                with bpy.data.libraries.load(str(path), link=link) as (data_from, data_to):
-                    data_to.objects = data_from.objects
-                # Create new collection
-                if tool.append_move_to_new_collection_after_import:
-                    newCollection = bpy.data.collections.new(str(path.name))
-                    bpy.context.scene.collection.children.link(newCollection)
-                #link object to collection
-                for obj in data_to.objects:
-                    removed = False
-                    if obj != None:
-                        if tool.append_move_to_new_collection_after_import:
-                            newCollection.objects.link(obj)
-                        else:
-                            bpy.context.collection.objects.link(obj)
-                    # remove cameras
-                    if removed == False and tool.deleteCameras == True: # This stops an error from occuring if obj is already deleted
-                        if obj.type == 'CAMERA':
-                            bpy.data.objects.remove(obj)
-                            removed = True      
-                    # remove lights
-                    if removed == False and tool.deleteLights == True: # This stops an error from occuring if obj is already deleted
-                        if obj.type == 'LIGHT':
-                            bpy.data.objects.remove(obj)
-                            removed = True
-                # Join objects if option turned on
-                if tool.append_join_new_objects:
-                    bpy.ops.object.select_all(action='DESELECT')
-                    for obj in data_to.objects:
-                        bpy.context.view_layer.objects.active = obj
-                        obj.select_set(True)
-                    bpy.ops.object.join()
-                    
-            if tool.appendType == 'materials':
-                with bpy.data.libraries.load(str(path), link=link) as (data_from, data_to):
-                    data_to.materials = data_from.materials
+            return [x for x in p.glob('*.blend') if x.is_file()] # Get filepaths of files with the extension .blend in the selected directory
+    
+    def processItem(self, context, path):
+        tool = context.scene.assetlibrarytools
+        link = False # append, set to true to keep the link to the original file
         if tool.appendType == 'objects':
-             DisplayMessageBox("Complete, objects appended")
+            # link all objects
+            with bpy.data.libraries.load(str(path), link=link) as (data_from, data_to):
+                data_to.objects = data_from.objects
+            # Create new collection
+            if tool.append_move_to_new_collection_after_import:
+                newCollection = bpy.data.collections.new(str(path.name))
+                bpy.context.scene.collection.children.link(newCollection)
+            #link object to collection
+            appended = [] # Appended objects that werent removed
+            for obj in data_to.objects:
+                removed = False
+                if obj == None:
+                    continue
+                if tool.append_move_to_new_collection_after_import:
+                    newCollection.objects.link(obj)
+                else:
+                    bpy.context.collection.objects.link(obj)
+                # remove cameras
+                if removed == False and tool.deleteCameras == True: # This stops an error from occuring if obj is already deleted
+                    if obj.type == 'CAMERA':
+                        bpy.data.objects.remove(obj)
+                        removed = True      
+                # remove lights
+                if removed == False and tool.deleteLights == True: # This stops an error from occuring if obj is already deleted
+                    if obj.type == 'LIGHT':
+                        bpy.data.objects.remove(obj)
+                        removed = True
+                if removed == False:
+                    appended.append(obj)
+            # Join objects if option turned on
+            if tool.append_join_new_objects:
+                joinMeshObjects(appended)
+                
         if tool.appendType == 'materials':
-            DisplayMessageBox("Complete, materials appended")
-        return{'FINISHED'}
+            with bpy.data.libraries.load(str(path), link=link) as (data_from, data_to):
+                data_to.materials = data_from.materials
+    
+    def finishJob(self, context, cancelled):
+        tool = context.scene.assetlibrarytools
+        if tool.appendType == 'objects':
+            return "Objects appended" if cancelled else "Complete, objects appended"
+        return "Materials appended" if cancelled else "Complete, materials appended"
 
 
 class OT_ManageAssets(Operator):
@@ -986,6 +1724,21 @@ class OT_UseDisplacementOnAll(Operator):
         return {'FINISHED'}
 
 
+# Switches every image imported with a proxy texture to its full resolution texture, or back to the proxy if none of them use full resolution
+class OT_SwapProxyTextures(Operator):
+    bl_label = "Swap proxy / full resolution textures"
+    bl_idname = "alt.swapproxytextures"
+    def execute(self, context):
+        images = [image for image in bpy.data.images if 'ALT_full_res' in image and 'ALT_proxy' in image]
+        fullRes = any(bpy.path.abspath(image.filepath) == image['ALT_proxy'] for image in images)
+        for image in images:
+            path = image['ALT_full_res'] if fullRes else image['ALT_proxy']
+            if bpy.path.abspath(image.filepath) != path and os.path.isfile(path):
+                image.filepath = path # Reloads the image
+        DisplayMessageBox("Done, {0} textures use {1}".format(len(images), "full resolution" if fullRes else "proxies"))
+        return {'FINISHED'}
+
+
 class OT_ChangeAllDisplacementScale(Operator):
     bl_label = "Change displacement scale on all materials"
     bl_idname = "alt.changealldispscale"
@@ -1088,27 +1841,102 @@ class OT_AssetSnapshotObject(Operator):
 class OT_AssetDownloaderOperator(Operator):
     bl_label = "Run script"
     bl_idname = "alt.assetdownloader"
-    def execute(self, context):
-        tool = context.scene.assetlibrarytools
-        ur = bpy.utils.user_resource('SCRIPTS')
-        # Do some input checking
+    
+    # Arguments for ALT_CC0AssetDownloader.py, see the top of main() in that script
+    def scriptArgs(tool, headless):
+        return [tool.downloader_save_path, tool.keywordFilter, tool.attributeFilter, tool.extensionFilter, str(tool.unZip), str(tool.deleteZips), str(tool.skipDuplicates), str(tool.downloadWorkers), str(tool.catalogMaxAge), str(tool.unzipWorkers), str(headless), str(tool.downloadRateLimit), tool.downloadOrder]
+    
+    # Do some input checking
+    def checkInputs(tool):
         if tool.downloader_save_path == '':
             DisplayMessageBox("Enter a save path", "Error", "ERROR")
         if ' ' in tool.downloader_save_path:
             DisplayMessageBox("Filepath invalid: space in filepath", "Error", "ERROR")
         if tool.keywordFilter == "":
             tool.keywordFilter = 'None'
-        if ' ' not in tool.downloader_save_path and tool.downloader_save_path != '':
+        return ' ' not in tool.downloader_save_path and tool.downloader_save_path != ''
+    
+    # Runs the script headless with the python blender ships with, its JSON lines progress output is read on a separate thread
+    def startBackgroundProcess(self, tool):
+        script = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'ALT_CC0AssetDownloader.py')
+        self.process = subprocess.Popen([sys.executable, script] + OT_AssetDownloaderOperator.scriptArgs(tool, True), stdout=subprocess.PIPE, text=True)
+        self.events = queue.Queue()
+        def readEvents(process, events):
+            for line in process.stdout:
+                try:
+                    events.put(json.loads(line))
+                except ValueError:
+                    print(line, end='')
+        threading.Thread(target=readEvents, args=(self.process, self.events), daemon=True).start()
+    
+    def execute(self, context):
+        tool = context.scene.assetlibrarytools
+        ur = bpy.utils.user_resource('SCRIPTS')
+        if OT_AssetDownloaderOperator.checkInputs(tool):
+            if tool.terminal == 'background':
+                self.startBackgroundProcess(tool) # Nothing waits for the process when not run from the UI
+                return {'FINISHED'}
             # Start ALT_CC0AssetDownloader.py via chosen terminal
+            scriptArgs = ' '.join(OT_AssetDownloaderOperator.scriptArgs(tool, False))
             if tool.terminal == 'xterm':
-                os.system('xterm -e "python3 {0}/ALT_CC0AssetDownloader.py {1} {2} {3} {4} {5} {6} {7}"'.format(ur+'/addons/AssetLibraryTools', tool.downloader_save_path, tool.keywordFilter, tool.attributeFilter, tool.extensionFilter, str(tool.unZip), str(tool.deleteZips), str(tool.skipDuplicates)))
+                os.system('xterm -e "python3 {0}/ALT_CC0AssetDownloader.py {1}"'.format(ur+'/addons/AssetLibraryTools', scriptArgs))
             if tool.terminal == 'konsole':
-                os.system('konsole -e "python3 {0}/ALT_CC0AssetDownloader.py {1} {2} {3} {4} {5} {6} {7}"'.format(ur+'/addons/AssetLibraryTools', tool.downloader_save_path, tool.keywordFilter, tool.attributeFilter, tool.extensionFilter, str(tool.unZip), str(tool.deleteZips), str(tool.skipDuplicates)))
+                os.system('konsole -e "python3 {0}/ALT_CC0AssetDownloader.py {1}"'.format(ur+'/addons/AssetLibraryTools', scriptArgs))
             if tool.terminal == 'gnome-terminal':
-                os.system('gnome-terminal -e "python3 {0}/ALT_CC0AssetDownloader.py {1} {2} {3} {4} {5} {6} {7}"'.format(ur+'/addons/AssetLibraryTools', tool.downloader_save_path, tool.keywordFilter, tool.attributeFilter, tool.extensionFilter, str(tool.unZip), str(tool.deleteZips), str(tool.skipDuplicates)))
+                os.system('gnome-terminal -e "python3 {0}/ALT_CC0AssetDownloader.py {1}"'.format(ur+'/addons/AssetLibraryTools', scriptArgs))
             if tool.terminal == 'cmd':
-                os.system('start cmd /k \"cd /D {0} & python ALT_CC0AssetDownloader.py {1} {2} {3} {4} {5} {6} {7}'.format(ur+'\\addons\\AssetLibraryTools', tool.downloader_save_path, tool.keywordFilter, tool.attributeFilter, tool.extensionFilter, str(tool.unZip), str(tool.deleteZips), str(tool.skipDuplicates)))  
+                os.system('start cmd /k \"cd /D {0} & python ALT_CC0AssetDownloader.py {1}'.format(ur+'\\addons\\AssetLibraryTools', scriptArgs))  
         return {'FINISHED'}
+    
+    # When run from the UI in background mode the progress is shown in the status bar until the script exits, Esc stops the download
+    # A stopped download is resumed from where it stopped the next time it is run with the same filters
+    def invoke(self, context, event):
+        tool = context.scene.assetlibrarytools
+        if tool.terminal != 'background':
+            return self.execute(context)
+        if not OT_AssetDownloaderOperator.checkInputs(tool):
+            return {'CANCELLED'}
+        self.startBackgroundProcess(tool)
+        self.summary = None
+        wm = context.window_manager
+        self.timer = wm.event_timer_add(0.5, window=context.window)
+        wm.progress_begin(0, 100)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.process.terminate()
+            self.finish(context)
+            DisplayMessageBox("Download stopped, run again to resume")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        while not self.events.empty():
+            e = self.events.get()
+            if e['event'] == 'progress':
+                if e['plannedBytes'] > 0:
+                    context.window_manager.progress_update(100 * e['bytes'] / e['plannedBytes'])
+                eta = "{0:.0f}s".format(e['eta']) if e['eta'] != None else "?"
+                context.workspace.status_text_set("Downloading assets: {0:.1f} MB/s, ETA {1} (Esc to stop)".format(e['throughput']/1e+6, eta))
+            elif e['event'] == 'done':
+                self.summary = "Complete, {0} assets downloaded, {1} failed, {2:.1f} MB at {3:.1f} MB/s".format(e['finished'], e['failed'], e['bytes']/1e+6, e['throughput']/1e+6)
+            elif e['event'] == 'log':
+                print(e['message'])
+        if self.process.poll() != None and self.events.empty():
+            self.finish(context)
+            if self.summary == None:
+                DisplayMessageBox("Asset downloader exited with an error, see the system console", "Error", "ERROR")
+            else:
+                DisplayMessageBox(self.summary)
+            return {'FINISHED'}
+        return {'PASS_THROUGH'}
+    
+    def finish(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self.timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
 
 
 class OT_ImportSBSAR(Operator):
@@ -1174,7 +2002,17 @@ class OBJECT_PT_panel(Panel):
                 matImportOptionsRow = matImportBox.row()
                 matImportBox.label(text="Import settings:")
                 matImportBox.prop(tool, "skip_existing")
+                matImportBox.prop(tool, "incremental_import")
                 matImportBox.prop(tool, "tex_ignore_filter")
+                matImportBox.prop(tool, "target_resolution")
+                matImportBox.prop(tool, "normal_map_convention")
+                matImportBox.prop(tool, "pbr_import_workers")
+                if tool.pbr_import_workers > 1:
+                    matImportBox.prop(tool, "shard_library_path")
+                matImportBox.prop(tool, "use_proxy_textures")
+                if tool.use_proxy_textures:
+                    matImportBox.prop(tool, "proxy_size")
+                    matImportBox.prop(tool, "proxy_cache_path")
                 matImportBox.separator()
                 matImportBox.label(text="Material settings:")
                 matImportBox.prop(tool, "use_fake_user")
@@ -1218,12 +2056,21 @@ class OBJECT_PT_panel(Panel):
                 modelImportBox.prop(tool, "hide_after_import")
                 modelImportBox.prop(tool, "move_to_new_collection_after_import")
                 modelImportBox.prop(tool, "join_new_objects")
+                modelImportBox.prop(tool, "model_import_workers")
+                if tool.model_import_workers > 1:
+                    modelImportBox.prop(tool, "shard_library_path")
+                modelImportBox.prop(tool, "use_model_cache")
+                if tool.use_model_cache:
+                    modelImportBox.prop(tool, "model_cache_path")
+                    modelImportBox.prop(tool, "model_cache_size")
                 modelImportBox.separator()
                 modelImportBox.label(text="Search for and import the following filetypes:")
                 modelImportBox.prop(tool, "import_fbx")
                 modelImportBox.prop(tool, "import_gltf")
                 modelImportBox.prop(tool, "import_obj")
                 modelImportBox.prop(tool, "import_x3d")
+                modelImportBox.prop(tool, "import_stl")
+                modelImportBox.prop(tool, "import_ply")
         
         
         # Append from other .blend UI
@@ -1286,6 +2133,8 @@ class OBJECT_PT_panel(Panel):
             utilBox.prop(tool, "dispNewScale")
             utilBox.operator("alt.changealldispscale")
             utilBox.operator("alt.userealdispall")
+            utilBox.separator()
+            utilBox.operator("alt.swapproxytextures")
         
         
         #Asset snapshot UI
@@ -1323,6 +2172,11 @@ class OBJECT_PT_panel(Panel):
             assetDownloaderBox.prop(tool, "unZip")
             assetDownloaderBox.prop(tool, "deleteZips")
             assetDownloaderBox.prop(tool, "skipDuplicates")
+            assetDownloaderBox.prop(tool, "downloadWorkers")
+            assetDownloaderBox.prop(tool, "unzipWorkers")
+            assetDownloaderBox.prop(tool, "downloadRateLimit")
+            assetDownloaderBox.prop(tool, "downloadOrder")
+            assetDownloaderBox.prop(tool, "catalogMaxAge")
             assetDownloaderBox.prop(tool, "terminal")
             assetDownloaderBox.operator("alt.assetdownloader")
             
@@ -1358,6 +2212,7 @@ classes = (
     OT_CleanupUnusedMaterials,
     OT_UseDisplacementOnAll,
     OT_ChangeAllDisplacementScale,
+    OT_SwapProxyTextures,
     OT_AssetSnapshotCollection,
     OT_AssetSnapshotObject,
     OT_AssetDownloaderOperator,
@@ -0,0 +1,95 @@
+# Benchmarks textureSets.FindPBRTextureType against the original implementation it replaced
+# Classifies synthetic texture file names with both and checks that every result is identical
+#
+# Example:
+#   python benchmarks/classifier_benchmark.py --files 100000
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+import textureSets
+
+
+# The original classifier, kept here as the reference for identical results
+def legacyFindPBRTextureType(fname):
+    PBRTT = None
+    # Remove digits
+    fname = ''.join(i for i in fname if not i.isdigit())
+    # Separate CamelCase by space
+    fname = re.sub("([a-z])([A-Z])","\\g<1> \\g<2>",fname)
+    # Replace common separators with SPACE
+    seperators = ['_', '.', '-', '__', '--', '#']
+    for sep in seperators:
+        fname = fname.replace(sep, ' ')
+    # Set entire string to lower case
+    fname = fname.lower()
+    # Find PBRTT
+    i = 0
+    for nameList in textureSets.nameLists:
+        for name in nameList:
+            if name in fname:
+                PBRTT = textureSets.texTypes[i]
+        i+=1
+    return PBRTT
+
+
+# Builds file names the way texture vendors do: asset name, resolution, one or more type tokens, variants, extension
+def syntheticNames(count, seed=0):
+    rng = random.Random(seed)
+    words = ["Rock", "Brick", "Wood", "Metal", "Fabric", "Ground", "Tiles", "Concrete", "Bark", "Marble", "Plaster", "Leather", "Gravel", "Moss"]
+    typeTokens = [n for names in textureSets.nameLists for n in names] + ["AO", "ambientocclusion", "cavity", "mask", "preview", "thumb", "NormalGL", "NormalDX", "BaseColor", "Roughness", "Metalness"]
+    separators = ['_', '-', '.', ' ', '']
+    extensions = ['.jpg', '.png', '.exr', '.tif', '.tga']
+    names = []
+    for n in range(count):
+        sep = rng.choice(separators)
+        parts = [rng.choice(words) + "{0:03d}".format(rng.randint(0, 999)), rng.choice(["1K", "2K", "4K", "8K", "2048", ""])]
+        for t in range(rng.choice([1, 1, 1, 2])):
+            token = rng.choice(typeTokens)
+            parts.append(rng.choice([token, token.upper(), token.capitalize()]))
+        if rng.random() < 0.2:
+            parts.append(rng.choice(["DX", "GL", "v2", "final", "#1"]))
+        names.append(sep.join(p for p in parts if p) + rng.choice(extensions))
+    return names
+
+
+def timeit(function, names):
+    start = time.perf_counter()
+    results = [function(n) for n in names]
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PBR texture type classifier")
+    parser.add_argument('--files', type=int, default=100000, help="Number of synthetic file names")
+    parser.add_argument('--unique', type=int, default=40000, help="Number of distinct names among them (libraries repeat names across sets)")
+    args = parser.parse_args()
+
+    unique = syntheticNames(min(args.unique, args.files))
+    rng = random.Random(1)
+    names = unique + [rng.choice(unique) for n in range(args.files - len(unique))]
+    rng.shuffle(names)
+
+    legacySeconds, legacyResults = timeit(legacyFindPBRTextureType, names)
+    textureSets.FindPBRTextureType.cache_clear()
+    coldSeconds, results = timeit(textureSets.FindPBRTextureType, names)
+    warmSeconds, warmResults = timeit(textureSets.FindPBRTextureType, names)
+
+    mismatches = [(n, a, b) for n, a, b in zip(names, legacyResults, results) if a != b]
+    print("{0} file names ({1} distinct)".format(len(names), len(unique)))
+    print("legacy:         {0:8.3f} s".format(legacySeconds))
+    print("compiled+cache: {0:8.3f} s  ({1:.1f}x)".format(coldSeconds, legacySeconds / coldSeconds))
+    print("warm cache:     {0:8.3f} s  ({1:.1f}x)".format(warmSeconds, legacySeconds / warmSeconds))
+    if mismatches or results != warmResults:
+        for m in mismatches[:20]:
+            print("MISMATCH {0!r}: legacy={1} new={2}".format(*m))
+        sys.exit(1)
+    print("All results identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# Benchmarks ALT_CC0AssetDownloader.py without touching ambientcg.com
+# A local HTTP server stands in for ambientcg, serving a synthetic downloads_csv and generated zip archives
+# Each configuration runs in its own process so peak memory use can be measured per run
+#
+# Example:
+#   python benchmarks/downloader_benchmark.py --assets 200 --size 4000000 --workers 1,4,8 --latency 50
+import argparse
+import http.server
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+try:
+    import resource
+except ImportError: # Not available on windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+import ALT_CC0AssetDownloader as downloader
+
+
+# Writes (assets) zip archives of roughly (size) bytes to (directory) and returns the rows of the matching downloads_csv
+# Each zip holds a few texture-like files of random data, so unzipping has to read and write every byte
+def generateAssets(directory, assets, size, sizeJitter, baseUrl):
+    rows = []
+    rng = random.Random(0)
+    for n in range(assets):
+        assetId = "Bench{0:05d}".format(n)
+        assetSize = max(1024, int(size * rng.uniform(1 - sizeJitter, 1 + sizeJitter)))
+        fileName = assetId + '_1K-JPG.zip'
+        with zipfile.ZipFile(os.path.join(directory, fileName), 'w', zipfile.ZIP_STORED) as z:
+            for texType in ['Color', 'NormalGL', 'Roughness', 'Displacement']:
+                z.writestr("{0}_1K_{1}.jpg".format(assetId, texType), rng.randbytes(assetSize // 4))
+        rows.append([assetId, '1K-JPG', 'zip', str(os.path.getsize(os.path.join(directory, fileName))), baseUrl + '/view?id=' + assetId, baseUrl + '/get?file=' + fileName])
+    with open(os.path.join(directory, 'downloads.csv'), 'w') as f:
+        f.write('assetId,downloadAttribute,filetype,size,downloadLink,rawLink\n')
+        for row in rows:
+            f.write(','.join(row) + '\n')
+    return rows
+
+
+# Minimal stand-in for the parts of ambientcg.com the downloader uses
+# Supports ETag revalidation of the csv and Range requests for the archives, latency is added to every request to simulate round trips
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+
+    directory = None
+    latency = 0
+    protocol_version = 'HTTP/1.1' # Keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if self.path.startswith('/api/v2/downloads_csv'):
+            path = os.path.join(self.directory, 'downloads.csv')
+        elif self.path.startswith('/get?file='):
+            path = os.path.join(self.directory, os.path.basename(self.path.split('=', 1)[1]))
+        else:
+            path = None
+        if path == None or not os.path.isfile(path):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        size = os.path.getsize(path)
+        etag = '"{0}-{1}"'.format(size, int(os.path.getmtime(path)))
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        start = 0
+        rangeHeader = re.match(r'bytes=(\d+)-', self.headers.get('Range', ''))
+        if rangeHeader:
+            start = int(rangeHeader.group(1))
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {0}-{1}/{2}'.format(start, size - 1, size))
+        else:
+            self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(size - start))
+        self.end_headers()
+        with open(path, 'rb') as f:
+            f.seek(start)
+            shutil.copyfileobj(f, self.wfile, 1024*1024)
+
+
+def startServer(directory, latency):
+    handler = type('Handler', (StandInHandler,), {'directory': directory, 'latency': latency})
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Runs one configuration of the downloader pipeline in this process and prints the results as JSON
+def runOne(config):
+    saveLocation = config['saveLocation'] + '/'
+    progress = downloader.Progress(headless=True, stream=open(os.devnull, 'w'))
+    catalogStart = time.time()
+    catalog = downloader.getCatalog(config['url'], config['cacheDir'], progress=progress)
+    catalogSeconds = time.time() - catalogStart
+    assets = downloader.scheduleAssets(downloader.getAssetsByFilters(catalog, [None, None, None]), config['order'])
+    start = time.time()
+    ok = downloader.download(assets, saveLocation, config['unZip'], True, True, config['workers'], None, config['unzipWorkers'], progress, config['maxRate'])
+    seconds = time.time() - start
+    peakRss = None
+    if resource != None:
+        peakRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    print(json.dumps({'ok': ok, 'seconds': seconds, 'catalogSeconds': catalogSeconds, 'bytes': progress.doneBytes, 'assets': len(assets), 'unzipSeconds': progress.unzipSeconds, 'peakRss': peakRss}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ALT_CC0AssetDownloader against a local stand-in for ambientcg.com")
+    parser.add_argument('--assets', type=int, default=100, help="Number of generated assets")
+    parser.add_argument('--size', type=int, default=2000000, help="Average size of each generated zip in bytes")
+    parser.add_argument('--size-jitter', type=float, default=0.5, help="Sizes vary randomly by up to this fraction")
+    parser.add_argument('--workers', default='1,4,8', help="Comma separated download worker counts to compare")
+    parser.add_argument('--unzip-workers', type=int, default=2)
+    parser.add_argument('--no-unzip', action='store_true', help="Only download, dont unzip")
+    parser.add_argument('--latency', type=float, default=20, help="Latency added to every request in milliseconds")
+    parser.add_argument('--max-rate', type=float, default=0, help="Download rate limit in MB/s, 0 = unlimited")
+    parser.add_argument('--order', default='name', choices=['name', 'smallest', 'largest'])
+    parser.add_argument('--run-one', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        runOne(json.loads(args.run_one))
+        return
+
+    workDir = tempfile.mkdtemp(prefix='ALT_DownloaderBenchmark_')
+    try:
+        serveDir = os.path.join(workDir, 'serve')
+        os.makedirs(serveDir)
+        server = startServer(serveDir, args.latency / 1000)
+        baseUrl = 'http://127.0.0.1:{0}'.format(server.server_port)
+        print("Generating {0} assets of about {1} bytes...".format(args.assets, args.size))
+        generateAssets(serveDir, args.assets, args.size, args.size_jitter, baseUrl)
+
+        print("{0:>8} {1:>10} {2:>10} {3:>10} {4:>10} {5:>12} {6:>14}".format('workers', 'seconds', 'MB/s', 'assets/s', 'unzip s', 'peak RSS MB', 'catalog ms'))
+        for workers in [int(w) for w in args.workers.split(',')]:
+            saveLocation = os.path.join(workDir, 'save{0}'.format(workers))
+            os.makedirs(saveLocation)
+            config = {'url': baseUrl + '/api/v2/downloads_csv', 'cacheDir': os.path.join(workDir, 'cache'), 'saveLocation': saveLocation, 'workers': workers, 'unzipWorkers': args.unzip_workers, 'unZip': not args.no_unzip, 'maxRate': args.max_rate * 1e+6, 'order': args.order}
+            output = subprocess.run([sys.executable, os.path.realpath(__file__), '--run-one', json.dumps(config)], check=True, capture_output=True, text=True).stdout
+            r = json.loads(output.strip().splitlines()[-1])
+            peakRss = "{0:.1f}".format(r['peakRss'] / 1e+6) if r['peakRss'] != None else "n/a"
+            print("{0:>8} {1:>10.2f} {2:>10.1f} {3:>10.1f} {4:>10.2f} {5:>12} {6:>14.1f}{7}".format(workers, r['seconds'], r['bytes'] / 1e+6 / r['seconds'], r['assets'] / r['seconds'], r['unzipSeconds'], peakRss, r['catalogSeconds'] * 1000, '' if r['ok'] else '  (failures!)'))
+            shutil.rmtree(saveLocation)
+        server.shutdown()
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
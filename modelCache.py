@@ -0,0 +1,140 @@
+# Conversion cache for imported model files
+# Each cached file holds what importing a model file made, saved as a .blend, so importing an unchanged file again is a library load
+# Nothing in here uses bpy, writing and loading the .blend files is left to the caller
+import hashlib
+import json
+import os
+import urllib.parse
+
+
+# Hash of the contents of a file, read in chunks so large models dont have to fit in memory
+def fileHash(path, chunkSize=1024*1024):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunkSize), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# Files named on the mtllib lines of an OBJ file, and the texture maps those .mtl files name
+def objCompanions(path):
+    directory = os.path.dirname(path)
+    companions = []
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.startswith(b'mtllib'):
+                name = line[6:].strip().decode('utf-8', 'surrogateescape')
+                # File names may contain spaces, otherwise several files can be listed on one line
+                names = [name] if os.path.isfile(os.path.join(directory, name)) else name.split()
+                companions += [os.path.join(directory, n) for n in names]
+    for mtl in list(companions):
+        if not os.path.isfile(mtl):
+            continue
+        with open(mtl, 'rb') as f:
+            for line in f:
+                words = line.split()
+                if words and (words[0].lower().startswith(b'map_') or words[0].lower() in (b'bump', b'disp', b'decal', b'refl')) and len(words) > 1:
+                    companions.append(os.path.join(os.path.dirname(mtl), words[-1].decode('utf-8', 'surrogateescape')))
+    return companions
+
+
+# Files named by the buffers and images of a .gltf file (embedded data: URIs are part of the file itself)
+def gltfCompanions(path):
+    with open(path, 'rb') as f:
+        gltf = json.load(f)
+    companions = []
+    for item in gltf.get('buffers', []) + gltf.get('images', []):
+        uri = item.get('uri')
+        if uri != None and not uri.startswith('data:'):
+            companions.append(os.path.join(os.path.dirname(path), urllib.parse.unquote(uri)))
+    return companions
+
+
+# Other files a model file refers to that change what importing it makes, as a list of paths (which may not exist)
+# Returns None for formats that can refer to files that arent found here (X3D Inline nodes and textures), those shouldnt be cached
+def companionFiles(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.obj':
+        return objCompanions(path)
+    if ext == '.gltf':
+        return gltfCompanions(path)
+    if ext == '.x3d':
+        return None
+    return []
+
+
+# A directory of cached conversions keyed by the content hash of the source file plus anything else that changes the result
+# (the folder it is in, importer, its options, blender version). Files are only ever added by renaming a finished file into place,
+# so several processes can share a cache. Using an entry updates its modification time, evict() removes the least recently used entries
+class ModelCache():
+
+    def __init__(self, directory, maxBytes, salt=""):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.salt = salt
+        self.hits = 0
+
+    # Returns None if the file cant be cached, see companionFiles
+    def key(self, path, *options):
+        try:
+            companions = companionFiles(path)
+        except (OSError, ValueError):
+            return None
+        if companions == None:
+            return None
+        h = hashlib.sha256(fileHash(path).encode('ascii'))
+        # Cached files hold absolute texture paths, so the same file in another folder (or a moved library) needs its own entry
+        h.update(b'\0' + os.path.dirname(os.path.abspath(path)).encode('utf-8', 'surrogateescape'))
+        for companion in companions:
+            h.update(b'\0' + os.path.relpath(companion, os.path.dirname(path)).encode('utf-8', 'surrogateescape') + b'\0')
+            h.update(fileHash(companion).encode('ascii') if os.path.isfile(companion) else b'missing')
+        for option in (self.salt,) + options:
+            h.update(b'\0' + str(option).encode('utf-8', 'surrogateescape'))
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.blend')
+
+    # Returns the path of the cached file for key, or None if there is none
+    def lookup(self, key):
+        path = self.path(key)
+        try:
+            os.utime(path) # Marks the entry as recently used
+        except OSError:
+            return None
+        self.hits += 1
+        return path
+
+    # Path to write a new entry to, pass it to commit() once it is complete
+    def partPath(self, key):
+        os.makedirs(os.path.dirname(self.path(key)), exist_ok=True)
+        return self.path(key) + '.{0}.part'.format(os.getpid())
+
+    def commit(self, key):
+        os.replace(self.partPath(key), self.path(key))
+
+    # Removes the least recently used entries until the cache is at most maxBytes big
+    # Returns the number of entries removed
+    def evict(self):
+        entries = []
+        total = 0
+        for dirPath, dirNames, fileNames in os.walk(self.directory):
+            for fileName in fileNames:
+                if fileName.endswith('.blend'):
+                    try:
+                        st = os.stat(os.path.join(dirPath, fileName))
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, os.path.join(dirPath, fileName)))
+                    total += st.st_size
+        removed = 0
+        for mtime, size, path in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+            total -= size
+        return removed
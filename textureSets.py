@@ -0,0 +1,155 @@
+# Texture set helpers used by the PBR importer
+# Nothing in here uses bpy, so it can be used (and benchmarked) outside of blender
+import os
+import re
+import pathlib
+import hashlib
+import functools
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+
+diffNames = ["diffuse", "diff", "albedo", "base", "col", "color"]
+sssNames = ["sss", "subsurface"]
+metNames = ["metallic", "metalness", "metal", "mtl", "met"]
+specNames = ["specularity", "specular", "spec", "spc"]
+roughNames = ["roughness", "rough", "rgh", "gloss", "glossy", "glossiness"]
+normNames = ["normal", "nor", "nrm", "nrml", "norm"]
+dispNames = ["displacement", "displace", "disp", "dsp", "height", "heightmap", "bump", "bmp"]
+alphaNames = ["alpha", "opacity"]
+emissiveNames = ["emissive", "emission"]
+
+nameLists = [diffNames, sssNames, metNames, specNames, roughNames, normNames, dispNames, alphaNames, emissiveNames]
+texTypes = ["diff", "sss", "met", "spec", "rough", "norm", "disp", "alpha", "emission"]
+
+
+# Everything FindPBRTextureType needs is compiled once when the module is loaded
+# ASCII names (nearly all of them) are normalized as bytes, where deleting and translating characters is done in a single C call each
+camelCaseRe = re.compile("([a-z])([A-Z])")
+camelCaseBytesRe = re.compile(rb"(?<=[a-z])(?=[A-Z])")
+separatorTable = str.maketrans('_.-#', '    ')
+lowerSeparatorTable = bytes.maketrans(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ_.-#', b'abcdefghijklmnopqrstuvwxyz    ')
+# One alternative per texture type, each a lookahead that succeeds if any of its names appears anywhere in the string
+# Alternatives are tried in order and later name lists win when a name from several lists appears, so the lists are added in reverse
+texTypeRe = re.compile('^(?:' + '|'.join('(?P<{0}>(?=.*(?:{1})))'.format(texTypes[i], '|'.join(re.escape(n) for n in nameLists[i])) for i in reversed(range(len(nameLists)))) + ')', re.DOTALL)
+
+
+# Removes digits, separates CamelCase and common separators by spaces, and sets the entire string to lower case
+def normalizeName(fname):
+    if fname.isascii():
+        fname = fname.encode('ascii').translate(None, b'0123456789')
+        return camelCaseBytesRe.sub(b' ', fname).translate(lowerSeparatorTable).decode('ascii')
+    fname = ''.join(i for i in fname if not i.isdigit())
+    fname = camelCaseRe.sub("\\g<1> \\g<2>", fname)
+    return fname.translate(separatorTable).lower()
+
+
+# Find the type of PBR texture a file is based on its name
+# Results are cached since the same file names come up again and again in texture libraries
+@functools.lru_cache(maxsize=65536)
+def FindPBRTextureType(fname):
+    m = texTypeRe.match(normalizeName(fname))
+    if m == None:
+        return None
+    return m.lastgroup
+
+
+# Resolution tokens in file names, either a number of K (2K, 4k) or a power of two pixel size (2048)
+resolutionRe = re.compile(r'(?<![0-9])(?:([0-9]{1,2})[kK](?![a-zA-Z])|(256|512|1024|2048|4096|8192|16384|32768)(?![0-9]))')
+directXNames = {"dx", "directx"}
+openGLNames = {"gl", "opengl", "ogl"}
+
+
+# Returns the resolution (in pixels, 1K = 1024) given in a file name, or None if the name doesnt contain one
+def textureResolution(fname):
+    m = resolutionRe.search(fname)
+    if m == None:
+        return None
+    if m.group(1) != None:
+        return int(m.group(1)) * 1024
+    return int(m.group(2))
+
+
+# Returns 'DX' or 'GL' if a file name says which normal map convention it uses, otherwise None
+def normalConvention(fname):
+    words = set(normalizeName(fname).split())
+    if words & directXNames:
+        return 'DX'
+    if words & openGLNames:
+        return 'GL'
+    return None
+
+
+# Picks one file per PBR texture type from the files of a texture set, without loading any of them
+# When there are several files of the same type (2K and 4K variants, DX and GL normals):
+#  normal maps in the preferred convention come first, then
+#  the file closest to targetResolution (in pixels, 0 = highest available), preferring the lower one when two are equally close, then
+#  files without a resolution in their name, then
+#  the first file by name
+# Returns a dict of texture type -> file
+def selectTextureFiles(files, targetResolution=0, preferredNormalConvention='GL'):
+    best = {}
+    for f in files:
+        t = FindPBRTextureType(f.name)
+        if t == None:
+            continue
+        conventionRank = 0
+        if t == "norm":
+            convention = normalConvention(f.name)
+            conventionRank = 0 if convention == preferredNormalConvention else (1 if convention == None else 2)
+        resolution = textureResolution(f.name)
+        if resolution == None:
+            resolutionRank = (1, 0)
+        elif targetResolution == 0:
+            resolutionRank = (0, -resolution)
+        else:
+            resolutionRank = (0, abs(resolution - targetResolution), resolution)
+        rank = (conventionRank, resolutionRank, f.name)
+        if t not in best or rank < best[t][0]:
+            best[t] = (rank, f)
+    return {t: best[t][1] for t in best}
+
+
+# Where the proxy (downscaled copy) of a texture is kept in a proxy cache directory
+# The name is a hash of the path, size and modification time of the source file and the proxy size, so a changed source gets a new proxy
+# The source is only stat'ed, never read, so checking a cache of a large library stays fast
+def proxyPath(cacheDir, source, size):
+    st = os.stat(source)
+    key = hashlib.sha1("{0}\0{1}\0{2}\0{3}".format(source, st.st_size, st.st_mtime_ns, size).encode('utf-8', 'surrogateescape')).hexdigest()
+    return os.path.join(cacheDir, key[:2], key + os.path.splitext(source)[1].lower())
+
+
+# A texture set directory found by scanTextureSets, files holds pathlib.Paths of the files directly inside it
+# fingerprint is a hash of the names, sizes and modification times of those files, or None if it wasnt asked for
+TextureSet = collections.namedtuple('TextureSet', ['name', 'path', 'files', 'fingerprint'])
+
+
+# Lists the files in a texture set directory, leaving out files with ignoreFilter in their name (if ignoreFilter is not empty)
+# os.scandir gets the file type from the directory listing, so this doesnt need a stat call per file unless a fingerprint is asked for
+def scanTextureSet(name, path, ignoreFilter="", fingerprint=False):
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_file() and (ignoreFilter == "" or ignoreFilter not in entry.name):
+                entries.append(entry)
+    entries.sort(key=lambda entry: entry.name)
+    digest = None
+    if fingerprint:
+        h = hashlib.sha1()
+        for entry in entries:
+            st = entry.stat()
+            h.update("{0}\0{1}\0{2}\n".format(entry.name, st.st_size, st.st_mtime_ns).encode('utf-8', 'surrogateescape'))
+        digest = h.hexdigest()
+    return TextureSet(name, path, [pathlib.Path(entry.path) for entry in entries], digest)
+
+
+# Finds the texture set directories in root (root/TextureSetName/textureFiles) and lists their files
+# The directories are listed on (workers) threads at once, which hides most of the latency of network drives
+# Returns a list of TextureSets sorted by name
+def scanTextureSets(root, ignoreFilter="", workers=16, fingerprints=False):
+    with os.scandir(root) as it:
+        setDirs = sorted((entry.name, entry.path) for entry in it if entry.is_dir())
+    if not setDirs:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(setDirs)))) as executor:
+        return list(executor.map(lambda d: scanTextureSet(d[0], d[1], ignoreFilter, fingerprints), setDirs))